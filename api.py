@@ -0,0 +1,274 @@
+#----------------------------------------------------------------------------#
+# JSON API.
+#
+# Rows are serialized straight from the selected column tuples, never
+# through ORM instances. Lists are streamed, either as one chunked JSON
+# array or, with ?format=ndjson (or Accept: application/x-ndjson), as
+# newline delimited JSON. ?fields=id,name limits the selected columns.
+#----------------------------------------------------------------------------#
+
+import json
+from collections import OrderedDict
+from datetime import datetime
+from itertools import chain, islice
+
+from flask import Blueprint, Response, request, jsonify, abort, stream_with_context, url_for
+
+from models import db, Venue, Artist, Show
+from queries import get_show_partitions, venue_shows, artist_shows, concurrently
+import search
+from autocomplete import KINDS, MAX_LIMIT, suggest
+import matching
+from scheduling import build_calendar
+from routing import read_replica
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+STREAM_BATCH_SIZE = 1000
+
+VENUE_FIELDS = OrderedDict((column.key, column) for column in (
+    Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone, Venue.image_link,
+    Venue.facebook_link, Venue.genres, Venue.website, Venue.seeking_talent, Venue.seeking_description
+))
+
+ARTIST_FIELDS = OrderedDict((column.key, column) for column in (
+    Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone, Artist.image_link,
+    Artist.facebook_link, Artist.genres, Artist.website, Artist.seeking_venue, Artist.seeking_description
+))
+
+SHOW_FIELDS = OrderedDict([
+    ('id', Show.id),
+    ('venue_id', Show.venue_id),
+    ('artist_id', Show.artist_id),
+    ('start_time', Show.start_time),
+    ('venue_name', Venue.name.label('venue_name')),
+    ('artist_name', Artist.name.label('artist_name')),
+    ('artist_image_link', Artist.image_link.label('artist_image_link'))
+])
+
+
+def to_json(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError('%r is not JSON serializable' % (value,))
+
+def dumps(data):
+    return json.dumps(data, default=to_json, separators=(',', ':'))
+
+def selected_fields(available):
+    names = request.args.get('fields')
+    if not names:
+        return list(available)
+    names = [name.strip() for name in names.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        abort(400, 'unknown fields: %s' % ', '.join(unknown))
+    return names
+
+def stream_rows(query, names):
+    # yield_per with stream_results keeps a server side cursor on
+    # PostgreSQL, so memory stays flat however many rows are streamed.
+    # The first batch is fetched here, inside the view, so a replica that
+    # cannot be reached falls back to the primary like any other read
+    # (routing.read_replica); a failure later in the stream can only cut
+    # the response short.
+    rows = iter(query.execution_options(stream_results=True).yield_per(STREAM_BATCH_SIZE))
+    rows = chain(list(islice(rows, 1)), rows)
+    ndjson = request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+    def generate():
+        if ndjson:
+            for row in rows:
+                yield dumps(dict(zip(names, row))) + '\n'
+        else:
+            yield '['
+            separator = ''
+            for row in rows:
+                yield separator + dumps(dict(zip(names, row)))
+                separator = ','
+            yield ']'
+
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+#  Lists
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+@read_replica
+def venues():
+    names = selected_fields(VENUE_FIELDS)
+    query = db.session.query(*[VENUE_FIELDS[name] for name in names]).order_by(Venue.id)
+    return stream_rows(query, names)
+
+@api.route('/artists')
+@read_replica
+def artists():
+    names = selected_fields(ARTIST_FIELDS)
+    query = db.session.query(*[ARTIST_FIELDS[name] for name in names]).order_by(Artist.id)
+    return stream_rows(query, names)
+
+@api.route('/shows')
+@read_replica
+def shows():
+    names = selected_fields(SHOW_FIELDS)
+    query = db.session.query(*[SHOW_FIELDS[name] for name in names]).select_from(Show)
+    # only join the tables whose columns were asked for
+    if 'venue_name' in names:
+        query = query.join(Venue, Show.venue_id==Venue.id)
+    if 'artist_name' in names or 'artist_image_link' in names:
+        query = query.join(Artist, Show.artist_id==Artist.id)
+    return stream_rows(query.order_by(Show.start_time, Show.id), names)
+
+
+#  Detail
+#  ----------------------------------------------------------------
+
+@api.route('/venues/<int:venue_id>')
+@read_replica
+def venue(venue_id):
+    names = selected_fields(VENUE_FIELDS)
+    row, shows = concurrently(
+        lambda: db.session.query(*[VENUE_FIELDS[name] for name in names]).filter(Venue.id==venue_id).first(),
+        lambda: venue_shows(venue_id).all()
+    )
+    if row is None:
+        abort(404)
+    data = dict(zip(names, row))
+    data.update(get_show_partitions(shows))
+    return Response(dumps(data), mimetype='application/json')
+
+@api.route('/artists/<int:artist_id>')
+@read_replica
+def artist(artist_id):
+    names = selected_fields(ARTIST_FIELDS)
+    row, shows = concurrently(
+        lambda: db.session.query(*[ARTIST_FIELDS[name] for name in names]).filter(Artist.id==artist_id).first(),
+        lambda: artist_shows(artist_id).all()
+    )
+    if row is None:
+        abort(404)
+    data = dict(zip(names, row))
+    data.update(get_show_partitions(shows))
+    return Response(dumps(data), mimetype='application/json')
+
+
+#  Matches
+#  ----------------------------------------------------------------
+
+def matches_response(model, matches, endpoint, key):
+    # the index holds ids and scores; the rest comes from one IN query,
+    # which also drops profiles deleted by another process since the build
+    rows = db.session.query(model.id, model.name, model.city, model.state, model.image_link, model.seeking_description) \
+        .filter(model.id.in_([id for id, score, shared in matches])).all() if matches else []
+    rows = {row.id: row for row in rows}
+    data = []
+    for id, score, shared in matches:
+        if id in rows:
+            match = rows[id]._asdict()
+            match.update(score=score, shared_genres=matching.mask_genres(shared), url=url_for(endpoint, **{key: id}))
+            data.append(match)
+    return jsonify({'matches': data})
+
+def matches_limit():
+    return max(1, min(request.args.get('limit', 10, type=int), matching.MAX_LIMIT))
+
+@api.route('/venues/<int:venue_id>/matches')
+@read_replica
+def venue_matches(venue_id):
+    # artists seeking a venue, best suited to this one first
+    venue = db.session.query(Venue.genres, Venue.city, Venue.state).filter(Venue.id==venue_id).first()
+    if venue is None:
+        abort(404)
+    return matches_response(Artist, matching.suggested_artists(venue, matches_limit()), 'main.show_artist', 'artist_id')
+
+@api.route('/artists/<int:artist_id>/matches')
+@read_replica
+def artist_matches(artist_id):
+    # venues seeking talent, best suited to this artist first
+    artist = db.session.query(Artist.genres, Artist.city, Artist.state).filter(Artist.id==artist_id).first()
+    if artist is None:
+        abort(404)
+    return matches_response(Venue, matching.suggested_venues(artist, matches_limit()), 'main.show_venue', 'venue_id')
+
+
+#  Calendar
+#  ----------------------------------------------------------------
+
+def calendar_response(shows):
+    # ?month=2026-10&start=2026-10-12&end=2026-10-19, as on the calendar pages
+    try:
+        calendar = build_calendar(shows, request.args.get('month'), request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        abort(400, str(e))
+    data = {
+        'start': calendar.start,
+        'end': calendar.end,
+        'shows': [show._asdict() for show in calendar.shows],
+        'free': [{'start': earliest, 'end': latest} for earliest, latest in calendar.free],
+        'month': calendar.month.strftime('%Y-%m'),
+        'weeks': [
+            [{'date': day.date.isoformat(), 'in_month': day.in_month, 'shows': [show._asdict() for show in day.shows]}
+             for day in week]
+            for week in calendar.weeks
+        ],
+    }
+    return Response(dumps(data), mimetype='application/json')
+
+@api.route('/venues/<int:venue_id>/calendar')
+@read_replica
+def venue_calendar(venue_id):
+    if db.session.query(Venue.id).filter(Venue.id==venue_id).first() is None:
+        abort(404)
+    return calendar_response(venue_shows(venue_id))
+
+@api.route('/artists/<int:artist_id>/calendar')
+@read_replica
+def artist_calendar(artist_id):
+    if db.session.query(Artist.id).filter(Artist.id==artist_id).first() is None:
+        abort(404)
+    return calendar_response(artist_shows(artist_id))
+
+
+#  Search
+#  ----------------------------------------------------------------
+
+@api.route('/search/venues')
+@read_replica
+def search_venues():
+    result = search.venues(request.args.get('q', ''), request.args.get('page', 1, type=int))
+    return jsonify(result._asdict())
+
+@api.route('/search/artists')
+@read_replica
+def search_artists():
+    result = search.artists(request.args.get('q', ''), request.args.get('page', 1, type=int))
+    return jsonify(result._asdict())
+
+
+@api.route('/autocomplete')
+@read_replica
+def autocomplete():
+    # ?q=mus&types=venue,city&limit=10
+    types = [name.strip() for name in request.args.get('types', 'venue,artist,city').split(',') if name.strip()]
+    unknown = [name for name in types if name not in KINDS]
+    if unknown:
+        abort(400, 'unknown types: %s' % ', '.join(unknown))
+    limit = max(1, min(request.args.get('limit', 10, type=int), MAX_LIMIT))
+    data = suggest(request.args.get('q', ''), limit, {KINDS[name] for name in types})
+    for suggestion in data:
+        if suggestion['type'] == 'venue':
+            suggestion['url'] = url_for('main.show_venue', venue_id=suggestion['id'])
+        elif suggestion['type'] == 'artist':
+            suggestion['url'] = url_for('main.show_artist', artist_id=suggestion['id'])
+        else:
+            suggestion['url'] = url_for('main.search_venues', search_term=suggestion['name'])
+    return jsonify({'suggestions': data})
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return jsonify({'error': error.name, 'message': error.description}), error.code
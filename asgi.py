@@ -0,0 +1,161 @@
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#
+#   uvicorn asgi:app --workers 2
+#
+# This is not async database access. The adapter accepts requests on the
+# event loop and hands each one, whole, to the unchanged WSGI app on a
+# thread pool; the view and every query it makes run synchronously there,
+# on a blocking SQLAlchemy 1.3 / psycopg2 connection. A slow query ties up
+# a pool thread but never the loop, so one process keeps as many database
+# round trips in flight as it has pool threads, instead of one per sync
+# worker. Nothing awaits the database.
+#
+# Read-only views (those wrapped in read_replica: listings, searches,
+# detail pages and the API) and all other requests get separate limits,
+# ASGI_READ_CONCURRENCY and ASGI_WRITE_CONCURRENCY. A request that waits
+# longer than ASGI_QUEUE_TIMEOUT seconds for a slot gets a 503.
+#----------------------------------------------------------------------------#
+
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.exceptions import HTTPException
+
+from app import create_app
+
+
+class AsgiAdapter(object):
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        config = wsgi_app.config
+        self.read_concurrency = config.get('ASGI_READ_CONCURRENCY', 30)
+        self.write_concurrency = config.get('ASGI_WRITE_CONCURRENCY', 4)
+        self.queue_timeout = config.get('ASGI_QUEUE_TIMEOUT', 10)
+        self.executor = ThreadPoolExecutor(self.read_concurrency + self.write_concurrency, thread_name_prefix='asgi')
+        # semaphores belong to the running loop, so they are made on first use
+        self.limits = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        if self.limits is None:
+            self.limits = {
+                True: asyncio.Semaphore(self.read_concurrency),
+                False: asyncio.Semaphore(self.write_concurrency),
+            }
+        limit = self.limits[self.is_read_only(scope)]
+        body = await read_body(receive)
+        try:
+            await asyncio.wait_for(limit.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            await send_unavailable(send)
+            return
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self.run_wsgi, build_environ(scope, body), send, loop)
+        finally:
+            limit.release()
+
+    def is_read_only(self, scope):
+        if scope['method'] not in ('GET', 'HEAD'):
+            return False
+        adapter = self.wsgi_app.url_map.bind('localhost', script_name=scope.get('root_path') or None)
+        try:
+            endpoint, _ = adapter.match(scope['path'], method=scope['method'])
+        except HTTPException:
+            return False
+        return getattr(self.wsgi_app.view_functions.get(endpoint), 'read_only', False)
+
+    def run_wsgi(self, environ, send, loop):
+        # runs on a pool thread; the body is passed to the loop chunk by
+        # chunk, waiting on each send so streamed responses keep backpressure
+        def call(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            started = False
+            for chunk in result:
+                if not started:
+                    call({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+                    started = True
+                if chunk:
+                    call({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                call({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+            call({'type': 'http.response.body', 'body': b''})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+async def send_unavailable(send):
+    await send({'type': 'http.response.start', 'status': 503,
+                'headers': [(b'content-type', b'text/plain'), (b'retry-after', b'1')]})
+    await send({'type': 'http.response.body', 'body': b'Service Unavailable'})
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = 'HTTP_' + name
+            environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+app = AsgiAdapter(create_app())
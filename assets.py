@@ -0,0 +1,216 @@
+#----------------------------------------------------------------------------#
+# Static assets.
+#
+#   flask assets build [--clean]
+#
+# Builds static/dist from the rest of static/: the stylesheets of each
+# bundle in BUNDLES are minified and concatenated, every file is copied
+# under a name carrying a hash of its content, and text files get .gz and
+# .br (with the brotli package installed) siblings. dist/manifest.json
+# maps each source name to its built name.
+#
+# Once built, url_for('static', filename=...) returns the hashed name,
+# served with a year long immutable Cache-Control and the precompressed
+# variant the client accepts. Without a build the sources are served as
+# before, so run the build again after editing static files. Earlier
+# builds are kept for pages rendered before a deploy until --clean.
+#----------------------------------------------------------------------------#
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import time
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+assets_cli = AppGroup('assets', help='Build the fingerprinted, precompressed static files.')
+
+BUILD_DIR = 'dist'
+MANIFEST = 'manifest.json'
+
+# bundle name -> stylesheets, in cascade order
+BUNDLES = {
+    'css/main.bundle.css': [
+        'css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css', 'css/main.responsive.css', 'css/main.quickfix.css',
+    ],
+}
+
+# worth precompressing; images and woff fonts are compressed already
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.ttf', '.otf', '.eot', '.json', '.txt'}
+
+# Content-Encoding -> suffix of the precompressed file, by preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# strings and comments, which the minifier must not rewrite inside
+CSS_VERBATIM = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*.*?\*/)', re.S)
+CSS_SPACE = re.compile(r'\s*([{};,>])\s*|(:)\s+')
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+#  Build
+#  ----------------------------------------------------------------
+
+def minify_code(code):
+    # no space is removed before a colon, where it separates a descendant
+    # pseudo-class selector
+    code = re.sub(r'\s+', ' ', code)
+    code = CSS_SPACE.sub(lambda match: match.group(1) or match.group(2), code)
+    return code.replace(';}', '}')
+
+def minify_css(text):
+    # the split alternates code and verbatim parts; license comments
+    # (/*! ... */) and strings are kept as they are, other comments dropped
+    parts = CSS_VERBATIM.split(text)
+    for number in range(0, len(parts), 2):
+        parts[number] = minify_code(parts[number])
+    for number in range(1, len(parts), 2):
+        if parts[number].startswith('/*') and not parts[number].startswith('/*!'):
+            parts[number] = ''
+    return ''.join(parts).strip()
+
+def fingerprint(name, content):
+    stem, extension = posixpath.splitext(name)
+    return '%s.%s%s' % (stem, hashlib.sha1(content).hexdigest()[:12], extension)
+
+def rewrite_urls(css, source, output, manifest):
+    # points url()s at the built copies, relative to where the output lives
+    def replace(match):
+        quote, url = match.groups()
+        if re.match(r'^(data:|[a-z]+://|//|/)', url):
+            return match.group(0)
+        path, suffix = re.match(r'^([^?#]*)(.*)$', url).groups()
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(source), path))
+        if target not in manifest:
+            return match.group(0)
+        built = posixpath.relpath(manifest[target], posixpath.dirname(output))
+        return 'url(%s%s%s%s)' % (quote, built, suffix, quote)
+    return CSS_URL.sub(replace, css)
+
+def source_files(static_folder):
+    for directory, subdirectories, files in os.walk(static_folder):
+        relative = os.path.relpath(directory, static_folder).replace(os.sep, '/')
+        if relative == BUILD_DIR or relative.startswith(BUILD_DIR + '/'):
+            continue
+        for name in files:
+            yield name if relative == '.' else relative + '/' + name
+
+def compress(path, content):
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+    variants = [('.gz', gzip.compress(content, 9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(content):
+            with open(path + suffix, 'wb') as out:
+                out.write(compressed)
+
+def build(static_folder, clean=False):
+    """Build static_folder/dist; returns the new manifest."""
+    build_folder = os.path.join(static_folder, BUILD_DIR)
+    outputs = {}
+    # stylesheets last, so the files their url()s point at are hashed first
+    names = sorted(source_files(static_folder), key=lambda name: (name.endswith('.css'), name))
+    manifest = {}
+    for name in names:
+        with open(os.path.join(static_folder, name), 'rb') as source:
+            content = source.read()
+        if name.endswith('.css'):
+            content = rewrite_urls(content.decode('utf-8'), name, name, manifest).encode('utf-8')
+        outputs[name] = content
+        manifest[name] = fingerprint(name, content)
+    for bundle, members in BUNDLES.items():
+        css = '\n'.join(rewrite_urls(minify_css(outputs[member].decode('utf-8')), member, bundle, manifest)
+                        for member in members)
+        outputs[bundle] = css.encode('utf-8')
+        manifest[bundle] = fingerprint(bundle, outputs[bundle])
+
+    written = set()
+    for name, content in outputs.items():
+        path = os.path.join(build_folder, *manifest[name].split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # hashed names never change content, so existing files are kept
+        if not os.path.exists(path):
+            with open(path, 'wb') as out:
+                out.write(content)
+            if posixpath.splitext(name)[1] in COMPRESSIBLE:
+                compress(path, content)
+        written.add(os.path.normpath(path))
+    with open(os.path.join(build_folder, MANIFEST), 'w') as out:
+        json.dump(manifest, out, indent=2, sort_keys=True)
+
+    if clean:
+        for directory, subdirectories, files in os.walk(build_folder):
+            for name in files:
+                path = os.path.normpath(os.path.join(directory, name))
+                original = re.sub(r'\.(gz|br)$', '', path)
+                if name != MANIFEST and original not in written:
+                    os.remove(path)
+    return manifest
+
+@assets_cli.command('build')
+@click.option('--clean', is_flag=True, help='Remove files left by earlier builds.')
+def build_command(clean):
+    """Fingerprint, minify and precompress static/ into static/dist."""
+    started = time.time()
+    manifest = build(current_app.static_folder, clean)
+    click.echo('assets: %d files built in %.1fs' % (len(manifest), time.time() - started), err=True)
+
+
+#  Serving
+#  ----------------------------------------------------------------
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, BUILD_DIR, MANIFEST)) as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return {}
+
+def built_filename(endpoint, values):
+    # the url_for override: static filenames are swapped for their build
+    if endpoint == 'static' and 'filename' in values:
+        manifest = current_app.extensions['assets']
+        if values['filename'] in manifest:
+            values['filename'] = BUILD_DIR + '/' + manifest[values['filename']]
+
+def asset_urls(bundle):
+    """URLs of a bundle: the built file, or its sources without a build."""
+    if bundle in current_app.extensions['assets']:
+        return [url_for('static', filename=bundle)]
+    return [url_for('static', filename=member) for member in BUNDLES[bundle]]
+
+def send_static_file(filename):
+    if not filename.startswith(BUILD_DIR + '/'):
+        return current_app.send_static_file(filename)
+    static_folder = current_app.static_folder
+    mimetype = mimetypes.guess_type(filename)[0]
+    encoding = None
+    if posixpath.splitext(filename)[1] in COMPRESSIBLE:
+        for name, suffix in ENCODINGS:
+            if request.accept_encodings[name] and os.path.exists(os.path.join(static_folder, filename + suffix)):
+                encoding = name
+                filename += suffix
+                break
+    response = send_from_directory(static_folder, filename, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+def init_app(app):
+    app.extensions['assets'] = load_manifest(app.static_folder)
+    app.url_defaults(built_filename)
+    app.view_functions['static'] = send_static_file
+    app.jinja_env.globals['asset_urls'] = asset_urls
@@ -0,0 +1,500 @@
+#----------------------------------------------------------------------------#
+# Autocomplete.
+#
+# As-you-type suggestions for the search boxes (/api/v1/autocomplete),
+# served from an in-memory prefix index over venue names, artist names
+# and cities, ranked by upcoming show count.
+#
+# The index holds the lower-cased text of every suggestion in one NUL
+# separated string, and an array of the offsets where its words begin,
+# sorted by the text that follows. The words starting with a prefix are
+# one contiguous run of that array, found by binary search; there is no
+# per-character node to pay for, which keeps a million names in tens of
+# megabytes rather than gigabytes. A short prefix can match a good part
+# of the index, so when the run is long the entries are walked in rank
+# order instead, which stops at the first few that match.
+#
+# Each app builds its index from one query per table on first use.
+# Venue, Artist and Show writes committed by this process are applied as
+# they commit; writes from other processes show up when the index is
+# rebuilt in the background, AUTOCOMPLETE_MAX_AGE seconds after the last
+# build.
+#----------------------------------------------------------------------------#
+
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime
+from itertools import islice
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from models import db, Venue, Artist, Show, VenueStats, ArtistStats
+
+VENUE, ARTIST, CITY = 0, 1, 2
+KINDS = {'venue': VENUE, 'artist': ARTIST, 'city': CITY}
+KIND_NAMES = {kind: name for name, kind in KINDS.items()}
+
+MAX_LIMIT = 20
+# prefixes matching at most this many words of a kind are ranked by
+# scanning them all; wider ones walk the entries in rank order instead
+WIDE_PREFIX = 1000
+# entries added or reranked since the build are scanned on lookups; past
+# this many the index is rebuilt
+MAX_CHANGES = 5000
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+def word_starts(key):
+    position = 0
+    for word in key.split(' '):
+        yield position
+        position += len(word) + 1
+
+
+def starting_with(words, prefix):
+    """Entries of a sorted (word, entry) list with a word starting with prefix."""
+    number = bisect_left(words, (prefix,))
+    while number < len(words) and words[number][0].startswith(prefix):
+        yield words[number][1]
+        number += 1
+
+
+class PrefixIndex(object):
+    """Ranked prefix lookups over venue names, artist names and cities.
+
+    venues and artists are (id, name, city, state, upcoming shows) rows
+    ordered by id. A city ranks by the upcoming shows at its venues.
+    """
+
+    def __init__(self, venues, artists):
+        self.kinds = array('b')
+        self.ids = array('l')
+        self.names = []
+        self.ranks = array('l')
+        # city entry of each venue and artist (-1 for the cities)
+        self.areas = array('l')
+        self.segments = {}
+        self.cities = {}
+        self.city_names = {}
+        # entries since dropped, and those added after the build; the
+        # words of these and of the entries reranked since, as sorted
+        # (word, entry) lists
+        self.deleted = set()
+        self.added = {}
+        self.extra = []
+        self.reranked = set()
+        self.moved = []
+
+        places = []
+        for kind, rows in ((VENUE, venues), (ARTIST, artists)):
+            start = len(self.ids)
+            for id, name, city, state, upcoming in rows:
+                self.kinds.append(kind)
+                self.ids.append(id)
+                self.names.append(name)
+                self.ranks.append(upcoming or 0)
+                places.append((city, state))
+            self.segments[kind] = (start, len(self.ids))
+        start = len(self.ids)
+        for entry, (city, state) in enumerate(places):
+            area = self.city_entry(city, state, build=True)
+            self.areas.append(area)
+            if self.kinds[entry] == VENUE:
+                self.ranks[area] += self.ranks[entry]
+        self.segments[CITY] = (start, len(self.ids))
+        self.areas.extend([-1] * (len(self.names) - len(self.areas)))
+        self.built = len(self.names)
+
+        keys = [normalize(name) for name in self.names]
+        self.text = '\0'.join(keys) + '\0'
+        self.starts = array('L')
+        offsets = array('L')
+        owners = array('L')
+        position = 0
+        for entry, key in enumerate(keys):
+            self.starts.append(position)
+            for start in word_starts(key):
+                offsets.append(position + start)
+                owners.append(entry)
+            position += len(key) + 1
+        del keys
+
+        # the kinds' entries, hence their words, are contiguous; each
+        # kind's words are sorted apart, and its entries by rank
+        self.offsets = array('L')
+        self.owners = array('L')
+        self.word_segments = {}
+        self.by_rank = {}
+        names, ranks = self.names, self.ranks
+        for kind, (first, last) in sorted(self.segments.items()):
+            low = bisect_left(owners, first)
+            high = bisect_left(owners, last)
+            order = sorted(range(low, high), key=lambda number: self.key_at(offsets[number]))
+            self.word_segments[kind] = (len(self.offsets), len(self.offsets) + len(order))
+            self.offsets.extend(offsets[number] for number in order)
+            self.owners.extend(owners[number] for number in order)
+            self.by_rank[kind] = array('L', sorted(
+                range(first, last), key=lambda entry: (-ranks[entry], names[entry].lower(), entry)))
+
+    def __len__(self):
+        return len(self.names) - len(self.deleted)
+
+    @property
+    def changes(self):
+        return len(self.extra) + len(self.moved)
+
+    def key_at(self, offset):
+        return self.text[offset:self.text.index('\0', offset)]
+
+    def key_of(self, entry):
+        if entry < self.built:
+            return self.key_at(self.starts[entry])
+        return normalize(self.names[entry])
+
+    def matches(self, entry, prefix):
+        key = self.key_of(entry)
+        return key.startswith(prefix) or ' ' + prefix in key
+
+    def words_of(self, entry):
+        key = self.key_of(entry)
+        return [(key[start:], entry) for start in word_starts(key)]
+
+    def city_entry(self, city, state, build=False):
+        place = (normalize(city), normalize(state))
+        entry = self.cities.get(place)
+        if entry is None:
+            entry = self.cities[place] = len(self.names)
+            self.kinds.append(CITY)
+            self.ids.append(0)
+            self.names.append('%s, %s' % (city, state))
+            self.ranks.append(0)
+            self.city_names[entry] = (city, state)
+            if not build:
+                self.areas.append(-1)
+                self.add_words(entry)
+        return entry
+
+    #  Lookups
+    #  ----------------------------------------------------------------
+
+    def prefix_range(self, prefix, low=0, high=None):
+        # a slice ending past its word's NUL compares like the shorter
+        # word, so slices of the prefix's length follow the sort order
+        text, offsets, size = self.text, self.offsets, len(prefix)
+        end = len(offsets) if high is None else high
+        high = end
+        while low < high:
+            middle = (low + high) // 2
+            if text[offsets[middle]:offsets[middle] + size] < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        start, high = low, end
+        while low < high:
+            middle = (low + high) // 2
+            if text[offsets[middle]:offsets[middle] + size] == prefix:
+                low = middle + 1
+            else:
+                high = middle
+        return start, low
+
+    def walk(self, prefix, kind, limit, budget):
+        """The first limit entries of kind in build rank order matching
+        prefix, or None when budget entries were not enough.
+
+        Reranked entries are skipped, as their build rank is stale; the
+        rest still rank as they did, so these are their best.
+        """
+        found = []
+        skipped, entries = self.deleted | self.reranked, self.by_rank[kind]
+        for entry in islice(entries, budget):
+            if entry not in skipped and self.matches(entry, prefix):
+                found.append(entry)
+                if len(found) == limit:
+                    return found
+        return found if budget >= len(entries) else None
+
+    def best(self, entries, kinds, limit):
+        names, ranks, entry_kinds, deleted = self.names, self.ranks, self.kinds, self.deleted
+        entries = {entry for entry in entries if entry_kinds[entry] in kinds and entry not in deleted}
+        return heapq.nsmallest(limit, entries, key=lambda entry: (-ranks[entry], names[entry].lower(), entry))
+
+    def suggest(self, prefix, limit=10, kinds=frozenset(KINDS.values())):
+        """Up to limit entries with a word starting with prefix, best ranked first."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        limit = min(limit, MAX_LIMIT)
+        entries = []
+        walked = False
+        for kind in kinds:
+            start, end = self.prefix_range(prefix, *self.word_segments[kind])
+            found = None
+            if end - start > WIDE_PREFIX:
+                # worth it while the walk is shorter than the run it avoids
+                found = self.walk(prefix, kind, limit, (end - start) // 4)
+            if found is None:
+                entries.extend(self.owners[start:end])
+            else:
+                entries.extend(found)
+                walked = True
+        if walked:
+            entries.extend(starting_with(self.moved, prefix))
+        entries.extend(starting_with(self.extra, prefix))
+        return self.best(entries, kinds, limit)
+
+    def describe(self, entry):
+        kind = self.kinds[entry]
+        if kind == CITY:
+            city, state = self.city_names[entry]
+            return {'type': 'city', 'name': self.names[entry], 'city': city, 'state': state, 'upcoming_shows': self.ranks[entry]}
+        city, state = self.city_names[self.areas[entry]]
+        return {'type': KIND_NAMES[kind], 'id': self.ids[entry], 'name': self.names[entry], 'city': city, 'state': state,
+                'upcoming_shows': self.ranks[entry]}
+
+    #  Changes
+    #  ----------------------------------------------------------------
+
+    def find(self, kind, id):
+        entry = self.added.get((kind, id))
+        if entry is not None:
+            return entry
+        start, end = self.segments[kind]
+        entry = bisect_left(self.ids, id, start, end)
+        if entry < end and self.ids[entry] == id and entry not in self.deleted:
+            return entry
+        return None
+
+    def add_words(self, entry):
+        for word in self.words_of(entry):
+            insort(self.extra, word)
+
+    def rerank(self, entry, delta):
+        # a venue's city moves with it
+        changed = (entry, self.areas[entry]) if self.kinds[entry] == VENUE else (entry,)
+        for entry in changed:
+            self.ranks[entry] += delta
+            if entry not in self.reranked:
+                self.reranked.add(entry)
+                for word in self.words_of(entry):
+                    insort(self.moved, word)
+
+    def upsert(self, kind, id, name, city, state):
+        entry = self.find(kind, id)
+        area = self.city_entry(city, state)
+        rank = 0
+        if entry is not None:
+            if self.names[entry] == name and self.areas[entry] == area:
+                return
+            rank = self.ranks[entry]
+            self.delete(kind, id)
+        entry = len(self.names)
+        self.kinds.append(kind)
+        self.ids.append(id)
+        self.names.append(name)
+        self.ranks.append(0)
+        self.areas.append(area)
+        self.added[(kind, id)] = entry
+        self.add_words(entry)
+        self.rerank(entry, rank)
+
+    def delete(self, kind, id):
+        entry = self.find(kind, id)
+        if entry is not None:
+            self.rerank(entry, -self.ranks[entry])
+            self.deleted.add(entry)
+            self.added.pop((kind, id), None)
+
+    def count_show(self, venue_id, artist_id, delta):
+        for kind, id in ((VENUE, venue_id), (ARTIST, artist_id)):
+            entry = self.find(kind, id)
+            if entry is not None:
+                self.rerank(entry, delta)
+
+    def apply(self, changes):
+        for change in changes:
+            getattr(self, change[0])(*change[1:])
+
+
+def build_index(on_snapshot=None):
+    """Build a PrefixIndex from the primary database.
+
+    Both tables are read in one transaction, on PostgreSQL from one
+    REPEATABLE READ snapshot. on_snapshot is called once that snapshot is
+    taken: the changes committed after it are the ones the index lacks.
+    """
+    selects = []
+    for model, stats, key in ((Venue, VenueStats, VenueStats.venue_id), (Artist, ArtistStats, ArtistStats.artist_id)):
+        selects.append(
+            db.select([model.id, model.name, model.city, model.state, stats.upcoming_shows_count])
+            .select_from(model.__table__.outerjoin(stats.__table__, key==model.id))
+            .order_by(model.id)
+        )
+    with db.engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection = connection.execution_options(isolation_level='REPEATABLE READ')
+        with connection.begin():
+            # the first statement of the transaction takes its snapshot
+            connection.execute(db.select([db.literal(1)]))
+            if on_snapshot is not None:
+                on_snapshot()
+            streamed = connection.execution_options(stream_results=True)
+            return PrefixIndex(*[streamed.execute(select) for select in selects])
+
+
+class Suggestions(object):
+    """An app's prefix index: built on first use, then rebuilt in a
+    background thread once it is older than AUTOCOMPLETE_MAX_AGE or has
+    collected too many changes.
+
+    Changes are collected from the moment a build's snapshot is taken and
+    applied to the new index once it is built. The show counts are
+    deltas, so a change already in the snapshot must not be applied
+    again; one committed just before the snapshot whose after_commit
+    hook runs just after it still is, which takes the two to overlap by
+    microseconds.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.index = None
+        self.built_at = 0
+        self.rebuilding = False
+        # changes committed since the running build's snapshot
+        self.pending = None
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+
+    def get_index(self):
+        if self.index is None:
+            with self.build_lock:
+                if self.index is None:
+                    self.build()
+        elif not self.rebuilding and (time.time() - self.built_at > self.app.config.get('AUTOCOMPLETE_MAX_AGE', 300)
+                                      or self.index.changes > MAX_CHANGES):
+            with self.lock:
+                if not self.rebuilding:
+                    self.rebuilding = True
+                    threading.Thread(target=self.rebuild, name='autocomplete-rebuild', daemon=True).start()
+        return self.index
+
+    def build(self):
+        try:
+            index = build_index(self.start_collecting)
+            with self.lock:
+                index.apply(self.pending)
+                self.index = index
+                self.built_at = time.time()
+        finally:
+            self.pending = None
+
+    def start_collecting(self):
+        with self.lock:
+            self.pending = []
+
+    def rebuild(self):
+        try:
+            with self.app.app_context():
+                self.build()
+        finally:
+            self.rebuilding = False
+
+    def apply(self, changes):
+        with self.lock:
+            if self.index is not None:
+                self.index.apply(changes)
+            if self.pending is not None:
+                self.pending.extend(changes)
+
+    def invalidate(self):
+        # rebuilt on the next lookup
+        self.built_at = 0
+
+    def suggest(self, prefix, limit=10, kinds=frozenset(KINDS.values())):
+        index = self.get_index()
+        return [index.describe(entry) for entry in index.suggest(prefix, limit, kinds)]
+
+
+def init_app(app):
+    app.extensions['autocomplete'] = Suggestions(app)
+
+def suggest(prefix, limit=10, kinds=frozenset(KINDS.values())):
+    return current_app.extensions['autocomplete'].suggest(prefix, limit, kinds)
+
+
+#----------------------------------------------------------------------------#
+# Change tracking.
+#
+# Writes are collected on the session and applied once they commit, so a
+# rolled back create or edit never shows up in the suggestions.
+#----------------------------------------------------------------------------#
+
+def record(target, change):
+    db.inspect(target).session.info.setdefault('autocomplete', []).append(change)
+
+def kind_of(target):
+    return VENUE if isinstance(target, Venue) else ARTIST
+
+def is_upcoming(start_time):
+    return start_time > datetime.utcnow()
+
+def previous_value(target, name):
+    history = db.inspect(target).attrs[name].history
+    return history.deleted[0] if history.deleted else getattr(target, name)
+
+def record_inserted_entity(mapper, connection, target):
+    record(target, ('upsert', kind_of(target), target.id, target.name, target.city, target.state))
+
+def record_updated_entity(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('name', 'city', 'state')):
+        record_inserted_entity(mapper, connection, target)
+
+def record_deleted_entity(mapper, connection, target):
+    record(target, ('delete', kind_of(target), target.id))
+
+def record_inserted_show(mapper, connection, target):
+    # ids are compared with the index's integer arrays; a form may have
+    # set them as strings
+    if is_upcoming(target.start_time):
+        record(target, ('count_show', int(target.venue_id), int(target.artist_id), 1))
+
+def record_deleted_show(mapper, connection, target):
+    if is_upcoming(previous_value(target, 'start_time')):
+        record(target, ('count_show', int(previous_value(target, 'venue_id')), int(previous_value(target, 'artist_id')), -1))
+
+def record_updated_show(mapper, connection, target):
+    record_deleted_show(mapper, connection, target)
+    record_inserted_show(mapper, connection, target)
+
+for model in (Venue, Artist):
+    event.listen(model, 'after_insert', record_inserted_entity)
+    event.listen(model, 'after_update', record_updated_entity)
+    event.listen(model, 'after_delete', record_deleted_entity)
+event.listen(Show, 'after_insert', record_inserted_show)
+event.listen(Show, 'after_update', record_updated_show)
+event.listen(Show, 'after_delete', record_deleted_show)
+
+@event.listens_for(db.session, 'after_commit')
+def apply_committed(session):
+    changes = session.info.pop('autocomplete', None)
+    if changes and has_app_context() and 'autocomplete' in current_app.extensions:
+        # the transaction has committed whatever happens here: an index
+        # that cannot take its changes is logged and rebuilt, never raised
+        # into the code that committed
+        suggestions = current_app.extensions['autocomplete']
+        try:
+            suggestions.apply(changes)
+        except Exception:
+            current_app.logger.exception('autocomplete: could not apply %d committed changes', len(changes))
+            suggestions.invalidate()
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_uncommitted(session):
+    session.info.pop('autocomplete', None)
@@ -0,0 +1,18 @@
+"""Benchmarks; each module is a script run from the repository root.
+
+    synthetic.py           seed a database with venues, artists and shows
+    bench_routes.py        latency and query counts for every GET route
+    bench_detail_pages.py  lazy relationship walk vs. joined show query
+    bench_search.py        n-gram search index vs. substring scan
+    check_search.py        pg_trgm and n-gram search return the same rows
+    check_show_batch.py    the batch show form lists a tour with CSRF on
+    check_conditional.py   detail page ETags change with the rows they show
+    check_bulk_import.py   data import rejects bad rows and loads the rest
+    bench_datetime.py      the datetime template filter
+    bench_import.py        startup time of app.py and create_app()
+    bench_asgi.py          sync workers vs. the ASGI adapter's thread pool
+    bench_autocomplete.py  prefix index build, memory and lookup latency
+    bench_matching.py      NumPy match scoring vs. a loop over the rows
+    bench_partitions.py    Show partition pruning, from EXPLAIN ANALYZE
+    bench_logging.py       queued JSON logging vs. a FileHandler in a burst
+"""
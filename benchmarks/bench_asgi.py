@@ -0,0 +1,144 @@
+"""Compare sync workers with the ASGI adapter under 500 concurrent clients.
+
+Both modes are driven in process by the same closed loop of asyncio
+clients, each sending its next request when the previous one finished:
+
+  sync  every request waits for one of --sync-workers threads that run
+        the WSGI app, as a server with that many sync workers would;
+  asgi  requests go straight to asgi.AsgiAdapter, which runs the same
+        WSGI app on its own thread pool with its concurrency limits.
+
+Neither mode does async database I/O: in both, every query blocks a
+thread. The comparison measures thread pool size and admission control,
+not async versus sync database access.
+
+The read routes are requested round robin. --db-latency-ms adds a sleep
+before every statement to stand in for the network round trip to a
+PostgreSQL server, which SQLite does not have; pass --db-latency-ms 0
+with a real --database to measure without it.
+
+    python benchmarks/bench_asgi.py --clients 500 --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import create_app
+from asgi import AsgiAdapter
+from benchmarks.bench_routes import percentile
+from benchmarks.synthetic import seed
+from models import db, Venue, Artist
+
+ROUTES = [
+    '/venues', '/artists', '/shows', '/venues/search?search_term=band', '/artists/search?search_term=sax',
+    '/venues/%(venue_id)d', '/artists/%(artist_id)d',
+]
+
+
+def scope_for(url):
+    path, _, query = url.partition('?')
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'headers': [(b'host', b'bench')], 'server': ('bench', 80), 'client': ('127.0.0.1', 0),
+    }
+
+async def call_asgi(asgi_app, url):
+    scope = scope_for(url)
+    status = {}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+
+    await asgi_app(scope, receive, send)
+    return status.get('code')
+
+def call_wsgi(app, url):
+    response = app.test_client().get(url)
+    response.get_data()
+    return response.status_code
+
+async def run_clients(clients, requests, urls, call):
+    timings = []
+    statuses = {}
+    counter = iter(range(requests))
+
+    async def client():
+        for number in counter:
+            start = time.perf_counter()
+            status = await call(urls[number % len(urls)])
+            timings.append((time.perf_counter() - start) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(clients)])
+    return time.perf_counter() - start, timings, statuses
+
+def report(name, elapsed, timings, statuses):
+    print('%-6s %8.0f req/s %9.1f %9.1f %9.1f  %s' % (
+        name, len(timings) / elapsed, percentile(timings, 50), percentile(timings, 95), percentile(timings, 99),
+        ' '.join('%s:%d' % item for item in sorted(statuses.items()))
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database')
+    parser.add_argument('--venues', type=int, default=200)
+    parser.add_argument('--artists', type=int, default=1000)
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--sync-workers', type=int, default=4)
+    parser.add_argument('--db-latency-ms', type=float, default=2.0)
+    args = parser.parse_args()
+
+    database = args.database
+    if database is None:
+        database = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_asgi.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database, 'PAGE_CACHE_TYPE': None, 'SQL_SLOW_REQUEST_MS': float('inf')})
+    with app.app_context():
+        if args.database is None:
+            venue_ids, artist_ids = seed(args.venues, args.artists, args.shows)
+        else:
+            venue_ids = [id for id, in db.session.query(Venue.id)]
+            artist_ids = [id for id, in db.session.query(Artist.id)]
+    urls = [route % {'venue_id': venue_ids[i % len(venue_ids)], 'artist_id': artist_ids[i % len(artist_ids)]}
+            for i, route in enumerate(ROUTES * 20)]
+
+    if args.db_latency_ms:
+        @event.listens_for(Engine, 'before_cursor_execute')
+        def network_round_trip(*_):
+            time.sleep(args.db_latency_ms / 1000)
+
+    print('%d clients, %d requests, %.1f ms per statement' % (args.clients, args.requests, args.db_latency_ms))
+    print('%-6s %14s %9s %9s %9s  %s' % ('mode', 'throughput', 'p50 ms', 'p95 ms', 'p99 ms', 'statuses'))
+
+    workers = ThreadPoolExecutor(args.sync_workers)
+
+    async def sync_call(url):
+        return await asyncio.get_running_loop().run_in_executor(workers, call_wsgi, app, url)
+
+    report('sync', *asyncio.run(run_clients(args.clients, args.requests, urls, sync_call)))
+    workers.shutdown()
+
+    asgi_app = AsgiAdapter(app)
+    report('asgi', *asyncio.run(run_clients(args.clients, args.requests, urls, lambda url: call_asgi(asgi_app, url))))
+    asgi_app.executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
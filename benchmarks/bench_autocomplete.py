@@ -0,0 +1,85 @@
+"""Measure the autocomplete prefix index: build time, memory and lookups.
+
+Names come from synthetic.Generator, half venues and half artists, with
+Zipf distributed upcoming show counts as ranks. With --memory a second
+build is traced for what the index retains and the peak during the
+build (tracemalloc slows it down several times). Lookups take prefixes
+of 1 to 8 characters of random name words, after --reranked show
+counts have changed.
+
+    python benchmarks/bench_autocomplete.py --names 1000000 --memory
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autocomplete import PrefixIndex, normalize
+from benchmarks.bench_routes import percentile
+from benchmarks.synthetic import Generator
+
+
+def rows(records, rng):
+    for id, record in enumerate(records, 1):
+        yield id, record['name'], record['city'], record['state'], int(rng.paretovariate(1.2)) - 1
+
+def prefixes(index, count, rng):
+    for _ in range(count):
+        words = normalize(rng.choice(index.names)).split(' ')
+        word = rng.choice(words)
+        yield word[:rng.randint(1, min(8, len(word)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--names', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=5000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--reranked', type=int, default=1000)
+    parser.add_argument('--memory', action='store_true', help='Trace the memory of a second build.')
+    args = parser.parse_args()
+
+    generator = Generator()
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    venues = list(rows(generator.venues(args.names // 2, now), rng))
+    artists = list(rows(generator.artists(args.names - args.names // 2, now), rng))
+
+    start = time.perf_counter()
+    index = PrefixIndex(venues, artists)
+    build = time.perf_counter() - start
+    print('%d names, %d cities, %d words: built in %.1f s' % (
+        len(index), len(index.cities), len(index.offsets), build))
+    if args.memory:
+        tracemalloc.start()
+        traced = PrefixIndex(venues, artists)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del traced
+        print('%.0f MB retained (%.0f MB peak)' % (retained / 2 ** 20, peak / 2 ** 20))
+    del venues, artists
+
+    for _ in range(args.reranked):
+        index.count_show(rng.randint(1, args.names // 2), rng.randint(1, args.names // 2), 1)
+
+    timings = {}
+    for prefix in prefixes(index, args.lookups, rng):
+        start = time.perf_counter()
+        index.suggest(prefix, args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        timings.setdefault(str(len(prefix)) if len(prefix) < 4 else '4+', []).append(elapsed)
+
+    print('%-8s %7s %9s %9s %9s %9s' % ('prefix', 'count', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms'))
+    for width, values in sorted(timings.items()):
+        print('%-8s %7d %9.3f %9.3f %9.3f %9.3f' % (
+            width, len(values),
+            percentile(values, 50), percentile(values, 95), percentile(values, 99), max(values)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Microbenchmark the ``datetime`` template filter.
+
+Formats one page worth of show times with the previous filter
+(dateutil parse + babel.dates.format_datetime) and with the current one,
+with and without the formatted string cache.
+
+    python benchmarks/bench_datetime.py --shows 500
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import babel.dates
+import dateutil.parser
+
+from filters import format_datetime
+
+
+def previous_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format="EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format="EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    start = datetime(2026, 10, 1, 20, 0)
+    values = [start + timedelta(days=i // 3, hours=i % 3) for i in range(args.shows)]
+    strings = [str(value) for value in values]
+    assert [previous_format_datetime(value, 'full') for value in strings] == [format_datetime(value, 'full') for value in values]
+
+    cached = lru_cache(maxsize=4096)(format_datetime)
+    cases = [
+        ('dateutil + babel (previous)', lambda: [previous_format_datetime(value, 'full') for value in strings]),
+        ('cached pattern', lambda: [format_datetime(value, 'full') for value in values]),
+        ('cached pattern + LRU', lambda: [cached(value, 'full') for value in values]),
+    ]
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print('%-28s %8.2f ms per %d shows  %6.1f us per call' % (name, best * 1000, args.shows, best * 1e6 / args.shows))
+
+
+if __name__ == '__main__':
+    main()
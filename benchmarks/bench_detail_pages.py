@@ -0,0 +1,109 @@
+"""Benchmark the venue detail page against a venue with a long show history.
+
+Compares walking the lazy ``Venue.Show`` relationship (one SELECT per show
+for its artist), the same walk with the ``venue_shows`` loader profile
+(see loading.py) and the single joined query used by ``show_venue()``.
+
+    python benchmarks/bench_detail_pages.py --shows 10000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+
+from app import create_app
+from loading import loader_options
+from models import db, Venue, Artist, Show
+from queries import get_show_partitions, venue_shows
+
+
+def seed(num_shows, num_artists):
+    db.create_all()
+    venue = Venue(name='Benchmark Hall', city='San Francisco', state='CA', genres='Jazz')
+    db.session.add(venue)
+    artists = [Artist(name='Artist %d' % i, city='San Francisco', state='CA', genres='Jazz') for i in range(num_artists)]
+    db.session.add_all(artists)
+    db.session.flush()
+    now = datetime.now()
+    db.session.bulk_insert_mappings(Show, [
+        {
+            'venue_id': venue.id,
+            'artist_id': artists[i % num_artists].id,
+            'start_time': now - timedelta(hours=num_shows - i - 10)
+        }
+        for i in range(num_shows)
+    ])
+    db.session.commit()
+    return venue.id
+
+
+def walk(venue):
+    now = datetime.now()
+    upcoming_shows, past_shows = [], []
+    for show in sorted(venue.Show, key=lambda show: show.start_time):
+        data = {
+            'artist_id': show.artist_id,
+            'artist_name': show.artist.name,
+            'artist_image_link': show.artist.image_link,
+            'start_time': show.start_time
+        }
+        (upcoming_shows if show.start_time > now else past_shows).append(data)
+    return upcoming_shows, past_shows
+
+def lazy_walk(venue_id):
+    return walk(db.session.query(Venue).get(venue_id))
+
+def profiled_walk(venue_id):
+    return walk(db.session.query(Venue).options(*loader_options('venue_shows')).filter(Venue.id==venue_id).one())
+
+
+def joined_query(venue_id):
+    db.session.query(Venue).get(venue_id)
+    partitions = get_show_partitions(venue_shows(venue_id))
+    return partitions['upcoming_shows'], partitions['past_shows']
+
+
+def measure(func, venue_id, repeat):
+    counter = {'queries': 0}
+
+    def count(*args):
+        counter['queries'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    timings = []
+    try:
+        for _ in range(repeat):
+            db.session.expunge_all()
+            start = time.perf_counter()
+            upcoming_shows, past_shows = func(venue_id)
+            timings.append(time.perf_counter() - start)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    return min(timings), counter['queries'] // repeat, len(upcoming_shows), len(past_shows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database', default='sqlite://')
+    args = parser.parse_args()
+
+    # the lazy walk is what raise mode exists to stop
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database, 'SQLALCHEMY_RAISE_ON_LAZY_LOAD': False})
+    with app.app_context():
+        venue_id = seed(args.shows, args.artists)
+        for name, func in (('lazy relationship walk', lazy_walk), ('venue_shows profile walk', profiled_walk),
+                           ('joined partition query', joined_query)):
+            best, queries, upcoming, past = measure(func, venue_id, args.repeat)
+            print('%-24s %8.1f ms %6d queries  %d upcoming / %d past' % (name, best * 1000, queries, upcoming, past))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Measure startup: importing app.py and building the app with create_app().
+
+Each case runs in a fresh interpreter, so nothing is shared between runs;
+the bare interpreter start is measured too and subtracted. The modules
+create_app() loads are listed with their cumulative time from
+``python -X importtime``: app itself, then what the factory imports.
+
+    python benchmarks/bench_import.py --repeat 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('import app', 'import app', {}),
+    ('create_app() (web worker)', 'import app; app.create_app()', {}),
+    ('create_app() (flask CLI)', 'import app; app.create_app()', {'FLASK_RUN_FROM_CLI': 'true'}),
+    ('create_app() + first page', "import app; app.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})"
+                                 ".test_client().get('/')", {}),
+]
+
+
+def run(code, env, repeat):
+    env = dict(os.environ, **env)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def top_level_imports(code):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True)
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # modules imported directly by the -c code; their own imports
+        # are included in the cumulative time
+        if name.startswith(' ') and not name.startswith('  '):
+            imports[name.strip()] = int(cumulative)
+    return imports
+
+def slowest_imports(code, count):
+    startup = top_level_imports('pass')
+    imports = [(cumulative, name) for name, cumulative in top_level_imports(code).items() if name not in startup]
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    interpreter = run('pass', {}, args.repeat)
+    print('%-28s %9.1f ms' % ('python -c pass', interpreter * 1000))
+    for name, code, env in CASES:
+        print('%-28s %9.1f ms' % (name, (run(code, env, args.repeat) - interpreter) * 1000))
+
+    print('\nimports of create_app():')
+    for cumulative, name in slowest_imports('import app; app.create_app()', args.top):
+        print('  %-26s %9.1f ms' % (name, cumulative / 1000))
+
+
+if __name__ == '__main__':
+    main()
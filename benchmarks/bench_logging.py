@@ -0,0 +1,98 @@
+"""Benchmark the queued JSON logging against a synchronous FileHandler.
+
+--threads threads each log --records errors as fast as they can, as in
+an error burst, first through a FileHandler on the calling thread (what
+app.py used to attach) and then through the logs.py pipeline. The report
+gives the time a logging call holds up its thread, and how many records
+reached the file. --fsync syncs the file after every write, as a slow or
+busy disk would stall it.
+
+    python benchmarks/bench_logging.py --threads 8 --records 5000 --fsync
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+import logs
+from benchmarks.bench_routes import percentile
+
+
+class SyncingFileHandler(logging.FileHandler):
+
+    def flush(self):
+        logging.FileHandler.flush(self)
+        if self.stream is not None:
+            os.fsync(self.stream.fileno())
+
+
+def burst(logger, threads, records):
+    timings = [[] for _ in range(threads)]
+
+    def run(timings):
+        for number in range(records):
+            start = time.perf_counter()
+            logger.error('burst record %d', number)
+            timings.append((time.perf_counter() - start) * 1000)
+
+    workers = [threading.Thread(target=run, args=(timings[number],)) for number in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start, [timing for thread in timings for timing in thread]
+
+def with_formatter(handler):
+    handler.setFormatter(logs.JSONFormatter())
+    return handler
+
+def count_lines(path):
+    with open(path) as file:
+        return sum(1 for _ in file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--records', type=int, default=5000, help='Records logged by each thread.')
+    parser.add_argument('--queue-size', type=int, default=10000)
+    parser.add_argument('--fsync', action='store_true', help='Sync the log file after every record.')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    print('%d threads x %d records%s' % (args.threads, args.records, ', fsync' if args.fsync else ''))
+    print('%-10s %9s %10s %10s %10s %10s' % ('handler', 'wall s', 'p50 ms', 'p99 ms', 'max ms', 'written'))
+
+    path = os.path.join(directory, 'sync.log')
+    logger = logging.getLogger('bench_logging.sync')
+    logger.propagate = False
+    handler = (SyncingFileHandler if args.fsync else logging.FileHandler)(path)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
+    logger.addHandler(handler)
+    elapsed, timings = burst(logger, args.threads, args.records)
+    handler.close()
+    print('%-10s %9.2f %10.3f %10.3f %10.3f %10d' % (
+        'file', elapsed, percentile(timings, 50), percentile(timings, 99), max(timings), count_lines(path)))
+
+    path = os.path.join(directory, 'queued.log')
+    app = Flask('bench_logging')
+    app.config.update(LOG_FILE=path, LOG_QUEUE_SIZE=args.queue_size)
+    logs.init_app(app)
+    if args.fsync:
+        app.extensions['logs'].make_handler = lambda: with_formatter(SyncingFileHandler(path))
+    elapsed, timings = burst(app.logger, args.threads, args.records)
+    app.extensions['logs'].stop()
+    print('%-10s %9.2f %10.3f %10.3f %10.3f %10d' % (
+        'queued', elapsed, percentile(timings, 50), percentile(timings, 99), max(timings), count_lines(path)))
+
+
+if __name__ == '__main__':
+    main()
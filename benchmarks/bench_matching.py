@@ -0,0 +1,75 @@
+"""Benchmark the NumPy match scoring against a Python loop over the rows.
+
+Seeking profiles get 1 to 3 random genres and one of a few hundred
+cities. Both sides compute the same scores; the loop is what ranking
+the seeking rows costs without the arrays.
+
+    python benchmarks/bench_matching.py --profiles 500000
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forms import state_choices, genres_choices
+from matching import MatchIndex, ARTIST, GENRE_WEIGHT, CITY_WEIGHT, STATE_WEIGHT
+from benchmarks.bench_routes import percentile
+
+
+def synthetic_profiles(count, rng):
+    states = [state for state, _ in state_choices]
+    genres = [genre for genre, _ in genres_choices]
+    places = [('City %d' % number, rng.choice(states)) for number in range(300)]
+    for id in range(1, count + 1):
+        city, state = rng.choice(places)
+        yield id, rng.sample(genres, rng.randint(1, 3)), city, state
+
+def loop_best(profiles, genres, city, state, limit):
+    genres = set(genres)
+    scored = []
+    for id, profile_genres, profile_city, profile_state in profiles:
+        shared = len(genres.intersection(profile_genres))
+        if shared:
+            score = shared * GENRE_WEIGHT + (profile_city == city and profile_state == state) * CITY_WEIGHT \
+                + (profile_state == state) * STATE_WEIGHT
+            scored.append((-score, id))
+    return heapq.nsmallest(limit, scored)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profiles', type=int, default=500000)
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    artists = list(synthetic_profiles(args.profiles, rng))
+    start = time.perf_counter()
+    index = MatchIndex([], artists)
+    print('%d seeking artists: built in %.1f s' % (len(index.profiles[ARTIST]), time.perf_counter() - start))
+
+    queries = [profile[1:] for profile in rng.sample(artists, args.lookups)]
+    for label, best in (
+        ('numpy', lambda genres, city, state: index.matches(ARTIST, genres, city, state, args.limit)),
+        ('loop', lambda genres, city, state: loop_best(artists, genres, city, state, args.limit)),
+    ):
+        timings = []
+        for genres, city, state in queries[:args.lookups if label == 'numpy' else 20]:
+            start = time.perf_counter()
+            best(genres, city, state)
+            timings.append((time.perf_counter() - start) * 1000)
+        print('%-6s %5d lookups  p50 %8.2f ms  p99 %8.2f ms' % (
+            label, len(timings), percentile(timings, 50), percentile(timings, 99)))
+
+    genres, city, state = queries[0]
+    assert [score for id, score, shared in index.matches(ARTIST, genres, city, state, args.limit)] == \
+        [-score for score, id in loop_best(artists, genres, city, state, args.limit)]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Check partition pruning on the Show table with EXPLAIN ANALYZE.
+
+Needs a PostgreSQL database migrated to the partitioned Show table. With
+--shows, that many shows spread over --years-back years of history and
+a year ahead are inserted first (venues and artists are seeded when
+there are none), and their partitions created as `flask partitions
+maintain` would.
+
+Each query runs against "Show" and against an unpartitioned temporary
+copy with the same indexes, its rows in id order. The report gives the
+partitions each plan scanned, out of all of them, and the median
+execution time of both.
+
+    python benchmarks/bench_partitions.py --database postgresql://localhost/fyyur_bench --shows 2000000
+"""
+import argparse
+import os
+import statistics
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, Venue
+from partitions import PARENT, DEFAULT, create_partitions, is_partitioned, month_index, month_start, partitions
+
+# the upcoming show queries of the app, as SQL over {table}
+QUERIES = [
+    ('upcoming shows, first page',
+     'SELECT id, venue_id, artist_id, start_time FROM {table} WHERE start_time > now() ORDER BY start_time, id LIMIT 20'),
+    ("a venue's next show",
+     'SELECT min(start_time) FROM {table} WHERE venue_id = :venue AND start_time > now()'),
+    ('upcoming shows per venue',
+     'SELECT venue_id, count(*) FROM {table} WHERE start_time > now() GROUP BY venue_id'),
+    ('shows started in the last hour',
+     "SELECT venue_id, count(*) FROM {table} WHERE start_time > now() - interval '1 hour' AND start_time <= now() "
+     'GROUP BY venue_id'),
+    # not prunable: the detail pages list past shows too
+    ("a venue's shows, all time",
+     'SELECT start_time FROM {table} WHERE venue_id = :venue ORDER BY start_time, id'),
+]
+
+FLAT = 'show_flat'
+
+
+def insert_shows(count, years_back):
+    if not db.session.query(Venue.id).first():
+        from benchmarks.synthetic import seed
+        seed(venues=2000, artists=10000, shows=0)
+    db.session.execute(
+        'INSERT INTO "Show" (venue_id, artist_id, start_time) '
+        'SELECT venues.ids[1 + floor(random() * array_length(venues.ids, 1))::integer], '
+        'artists.ids[1 + floor(random() * array_length(artists.ids, 1))::integer], '
+        "date_trunc('hour', timezone('utc', now()) + (random() * (:days_back + 365) - :days_back) * interval '1 day') "
+        'FROM generate_series(1, :count), '
+        '(SELECT array_agg(id) AS ids FROM "Venue") venues, (SELECT array_agg(id) AS ids FROM "Artist") artists',
+        {'count': count, 'days_back': int(years_back * 365)})
+    create_partitions(month_start(month_index(datetime.utcnow()) + 13), 3)
+    db.session.commit()
+
+def scanned_relations(plan):
+    # the tables of the scan nodes that ran at least once
+    found = set()
+    if 'Relation Name' in plan and plan.get('Actual Loops', 0) > 0:
+        found.add(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found |= scanned_relations(child)
+    return found
+
+def explain(sql, params):
+    result = db.session.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, params).scalar()
+    result = result[0] if isinstance(result, list) else result
+    return scanned_relations(result['Plan']), result['Execution Time']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--shows', type=int, default=0, help='Shows to insert first.')
+    parser.add_argument('--years-back', type=float, default=5)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database, 'PAGE_CACHE_TYPE': None})
+    with app.app_context():
+        if not is_partitioned():
+            sys.exit('%s: the Show table is not partitioned; run `flask db upgrade` on PostgreSQL' % args.database)
+        if args.shows:
+            insert_shows(args.shows, args.years_back)
+        db.session.execute('ANALYZE "%s"' % PARENT)
+        # in id order, as the table was laid out before partitioning
+        db.session.execute('CREATE TEMPORARY TABLE %s AS SELECT * FROM "%s" ORDER BY id' % (FLAT, PARENT))
+        db.session.execute('ALTER TABLE %s ADD PRIMARY KEY (id)' % FLAT)
+        for columns in ('start_time, id', 'venue_id, start_time', 'artist_id, start_time'):
+            db.session.execute('CREATE INDEX ON %s (%s)' % (FLAT, columns))
+        db.session.execute('ANALYZE %s' % FLAT)
+
+        total = db.session.execute('SELECT count(*) FROM "%s"' % PARENT).scalar()
+        names = [name for name, start, end in partitions()] + [DEFAULT]
+        venue = db.session.execute(
+            'SELECT venue_id FROM "%s" GROUP BY venue_id ORDER BY count(*) DESC LIMIT 1' % PARENT).scalar()
+        print('%d shows in %d partitions' % (total, len(names)))
+        print('%-32s %10s %16s %12s' % ('query', 'scanned', 'partitioned ms', 'flat ms'))
+        for label, sql in QUERIES:
+            params = {'venue': venue}
+            timings = {}
+            for table in ('"%s"' % PARENT, FLAT):
+                runs = [explain(sql.format(table=table), params) for _ in range(args.runs)]
+                timings[table] = statistics.median(elapsed for relations, elapsed in runs)
+                if table != FLAT:
+                    scanned = runs[-1][0]
+            print('%-32s %4d of %-3d %16.2f %12.2f' % (
+                label, len(scanned), len(names), timings['"%s"' % PARENT], timings[FLAT]))
+        db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
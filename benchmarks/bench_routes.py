@@ -0,0 +1,182 @@
+"""Load-test every GET route of the app through the Flask test client.
+
+Seeds a database with benchmarks/synthetic.py (unless --no-seed), then
+requests each GET rule in the URL map --requests times with ids drawn
+from the seeded rows, and reports p50/p95/p99 latency and queries per
+request. --output saves the run as JSON; --compare prints the change
+against an earlier run.
+
+    python benchmarks/bench_routes.py --shows 200000 --output run.json
+    python benchmarks/bench_routes.py --shows 200000 --compare run.json
+
+The page cache is off unless --page-cache is given, so each request
+measures the full view. Exits with status 1 if any route answers 5xx.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import warnings
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import url_for
+
+from app import create_app
+from instrumentation import QueryStats, collectors
+from benchmarks.synthetic import seed
+from models import db, Venue, Artist
+
+SEARCH_TERMS = ['band', 'sax', 'Wild Sax', 'San Francisco, CA', 'jazz', 'zzq']
+# GET rules that are forms or diagnostics, not pages worth tracking
+SKIPPED_ENDPOINTS = {'static', 'main.cache_stats'}
+
+
+def percentile(values, percent):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(percent / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def routes(app):
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if 'GET' in rule.methods and rule.endpoint not in SKIPPED_ENDPOINTS:
+            yield rule
+
+def build_url(app, rule, rng, venue_ids, artist_ids):
+    values = {}
+    for argument in rule.arguments:
+        if argument == 'venue_id':
+            values[argument] = rng.choice(venue_ids)
+        elif argument == 'artist_id':
+            values[argument] = rng.choice(artist_ids)
+        else:
+            return None
+    with app.test_request_context():
+        if rule.endpoint in ('main.search_venues', 'main.search_artists'):
+            values['search_term'] = rng.choice(SEARCH_TERMS)
+        elif rule.endpoint in ('api.search_venues', 'api.search_artists'):
+            values['q'] = rng.choice(SEARCH_TERMS)
+        return url_for(rule.endpoint, **values)
+
+def run_route(app, client, rule, requests, rng, venue_ids, artist_ids):
+    timings = []
+    queries = []
+    statuses = {}
+    for number in range(requests + 1):
+        url = build_url(app, rule, rng, venue_ids, artist_ids)
+        stats = QueryStats(keep=0)
+        collectors().append(stats)
+        start = time.perf_counter()
+        try:
+            response = client.get(url)
+            response.get_data()
+        finally:
+            elapsed = time.perf_counter() - start
+            collectors().remove(stats)
+        # the first request warms up imports, the search index and pools
+        if number == 0:
+            continue
+        timings.append(elapsed * 1000)
+        queries.append(stats.count)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries': round(sum(queries) / len(queries), 2),
+        'max_queries': max(queries),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+def compare(results, previous):
+    print('\nchange against %s' % previous['meta']['finished'])
+    print('%-36s %12s %12s %10s' % ('route', 'p50', 'p95', 'queries'))
+    for route, result in results['routes'].items():
+        before = previous['routes'].get(route)
+        if before is None:
+            continue
+        print('%-36s %+11.1f%% %+11.1f%% %+10.2f' % (
+            route,
+            (result['p50_ms'] / before['p50_ms'] - 1) * 100 if before['p50_ms'] else 0,
+            (result['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0,
+            result['queries'] - before['queries']
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default='sqlite://')
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--shows', type=int, default=20000)
+    parser.add_argument('--no-seed', action='store_true', help='benchmark the rows already in --database')
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--page-cache', action='store_true')
+    parser.add_argument('--route', action='append', help='only run rules containing this text')
+    parser.add_argument('--output')
+    parser.add_argument('--compare')
+    args = parser.parse_args()
+
+    # Form is deprecated in flask_wtf; one warning per request drowns the table
+    warnings.simplefilter('ignore', DeprecationWarning)
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': args.database,
+        'SQL_SLOW_REQUEST_MS': float('inf'),
+        'PAGE_CACHE_TYPE': 'lru' if args.page_cache else None,
+    })
+    rng = random.Random(1)
+    results = {
+        'meta': {
+            'started': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'requests': args.requests,
+            'page_cache': args.page_cache,
+        },
+        'routes': {},
+    }
+
+    failed = False
+    with app.app_context():
+        results['meta']['database'] = db.engine.dialect.name
+        if not args.no_seed:
+            start = time.perf_counter()
+            seed(args.venues, args.artists, args.shows)
+            print('seeded %d venues, %d artists, %d shows in %.1f s'
+                  % (args.venues, args.artists, args.shows, time.perf_counter() - start))
+        venue_ids = [id for id, in db.session.query(Venue.id)]
+        artist_ids = [id for id, in db.session.query(Artist.id)]
+        db.session.remove()
+        results['meta'].update(venues=len(venue_ids), artists=len(artist_ids))
+
+    client = app.test_client()
+    print('%-36s %9s %9s %9s %9s  %s' % ('route', 'p50 ms', 'p95 ms', 'p99 ms', 'queries', 'statuses'))
+    for rule in routes(app):
+        if args.route and not any(text in rule.rule for text in args.route):
+            continue
+        if build_url(app, rule, rng, venue_ids, artist_ids) is None:
+            continue
+        result = run_route(app, client, rule, args.requests, rng, venue_ids, artist_ids)
+        results['routes'][rule.rule] = result
+        failed = failed or any(status.startswith('5') for status in result['statuses'])
+        print('%-36s %9.1f %9.1f %9.1f %9.1f  %s' % (
+            rule.rule, result['p50_ms'], result['p95_ms'], result['p99_ms'], result['queries'],
+            ' '.join('%s:%d' % item for item in result['statuses'].items())
+        ))
+    results['meta']['finished'] = datetime.utcnow().isoformat()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
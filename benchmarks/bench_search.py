@@ -0,0 +1,75 @@
+"""Benchmark the in-memory n-gram search index against a substring scan.
+
+The scan is what ``name ILIKE '%term%'`` costs without an index; the
+n-gram index is the fallback used by search.py off PostgreSQL.
+
+    python benchmarks/bench_search.py --artists 1000000
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forms import state_choices, genres_choices
+from search import NgramIndex
+
+WORDS = [
+    'the', 'wild', 'sax', 'band', 'guns', 'petals', 'musical', 'hop', 'park', 'square', 'live',
+    'dueling', 'pianos', 'electric', 'velvet', 'midnight', 'river', 'echo', 'neon', 'lions',
+    'silver', 'quartet', 'orchestra', 'collective', 'brothers', 'sisters', 'trio', 'club'
+]
+CITIES = ['San Francisco', 'New York', 'Chicago', 'Austin', 'Seattle', 'Nashville', 'New Orleans', 'Denver']
+TERMS = ['band', 'sax', 'Wild Sax', 'midnight echo', 'zzq', 'New Orleans, LA', 'jazz']
+
+
+def synthetic_rows(count, seed=1):
+    rng = random.Random(seed)
+    states = [state for state, _ in state_choices]
+    genres = [genre for genre, _ in genres_choices]
+    for i in range(count):
+        name = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title() + ' %d' % i
+        yield i, name, rng.choice(CITIES), rng.choice(states), rng.sample(genres, rng.randint(1, 3))
+
+
+def scan(rows, term):
+    term = term.lower()
+    return [row for row in rows if term in row[1].lower() or term in row[2].lower() or term == row[3].lower()
+            or term in (genre.lower() for genre in row[4])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--artists', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rows = list(synthetic_rows(args.artists))
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    index = NgramIndex()
+    for id, name, city, state, genres in rows:
+        index.add({'id': id, 'name': name}, name, city, state, genres)
+    build = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print('built index over %d artists in %.1f s, ~%d MB, %d distinct n-grams'
+          % (len(index), build, (rss_after - rss_before) // 1024, len(index.postings)))
+
+    print('%-18s %10s %12s %12s' % ('term', 'matches', 'scan ms', 'index ms'))
+    for term in TERMS:
+        timings = {'scan': [], 'index': []}
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            scan(rows, term)
+            timings['scan'].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            matches = index.search(term)
+            timings['index'].append(time.perf_counter() - start)
+        print('%-18s %10d %12.1f %12.1f' % (term, len(matches), min(timings['scan']) * 1000, min(timings['index']) * 1000))
+
+
+if __name__ == '__main__':
+    main()
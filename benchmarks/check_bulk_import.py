@@ -0,0 +1,70 @@
+"""Check that `flask data import` rejects bad rows without failing the file.
+
+Imports a venues CSV, an artists CSV and a shows CSV into a temporary
+SQLite database. Each file mixes good rows with rows missing a required
+value (an empty name, city, genres or start time). The good rows must be
+imported and the bad ones counted as rejected, with the command exiting
+0. Exits with status 1 on any failure.
+
+    python benchmarks/check_bulk_import.py
+"""
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, Venue, Artist, Show
+
+# table -> (file contents, rows imported, rows rejected)
+FILES = [
+    ('venues', 'name,city,state,address,genres\n'
+               'Good Hall,San Francisco,CA,1 Main St,Jazz\n'
+               ',San Francisco,CA,2 Main St,Jazz\n'
+               'Cityless Hall,,CA,3 Main St,Jazz\n'
+               'Other Hall,New York,NY,4 Main St,"Rock n Roll,Folk"\n', 2, 2),
+    ('artists', 'name,city,state,genres\n'
+                'Good Band,San Francisco,CA,Jazz\n'
+                'Genreless Band,San Francisco,CA,\n', 1, 1),
+    ('shows', 'venue,artist,start_time\n'
+              'Good Hall,Good Band,2031-06-01T20:00:00\n'
+              'Good Hall,Good Band,\n'
+              'Other Hall,Good Band,2031-06-02T20:00:00\n', 2, 1),
+]
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'check_bulk_import.db')})
+    with app.app_context():
+        db.create_all()
+
+    failures = []
+    runner = app.test_cli_runner(mix_stderr=False)
+    for table, contents, imported, rejected in FILES:
+        path = os.path.join(directory, '%s.csv' % table)
+        with open(path, 'w') as file:
+            file.write(contents)
+        result = runner.invoke(args=['data', 'import', table, path])
+        summary = re.search(r'(\d+) rows imported, (\d+) rejected in', result.stderr)
+        counts = tuple(map(int, summary.groups())) if summary else None
+        if result.exit_code != 0 or counts != (imported, rejected):
+            failures.append('%s: exit %d, imported/rejected %s, expected %s%s' % (
+                table, result.exit_code, counts, (imported, rejected),
+                '' if result.exception is None else ' (%r)' % result.exception))
+
+    with app.app_context():
+        counts = (Venue.query.count(), Artist.query.count(), Show.query.count())
+    if counts != (2, 1, 2):
+        failures.append('the tables hold %d venues, %d artists, %d shows, expected 2, 1, 2' % counts)
+
+    for failure in failures:
+        print('FAIL', failure)
+    print('%d checks failed' % len(failures))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
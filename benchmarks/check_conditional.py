@@ -0,0 +1,58 @@
+"""Check that detail page ETags change when what the page shows changes.
+
+Builds the app on a temporary SQLite database with a venue, an artist
+and a show between them. For each detail page it takes the ETag, checks
+an unchanged page answers If-None-Match with 304, then renames the
+counterpart the page lists (the artist on the venue page, the venue on
+the artist page) and checks the same If-None-Match now gets a 200 with
+the new name. Exits with status 1 on any failure.
+
+    python benchmarks/check_conditional.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, Venue, Artist, Show
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), 'check_conditional.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path, 'PAGE_CACHE_TYPE': None})
+    with app.app_context():
+        db.create_all()
+        venue = Venue(name='Etag Hall', city='San Francisco', state='CA', address='1 Main St', genres=['Jazz'])
+        artist = Artist(name='Etag Band', city='San Francisco', state='CA', genres=['Jazz'])
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.utcnow() + timedelta(days=7)))
+        db.session.commit()
+        pages = [('/venues/%d' % venue.id, Artist, artist.id), ('/artists/%d' % artist.id, Venue, venue.id)]
+
+    failures = []
+    client = app.test_client()
+    for url, counterpart, counterpart_id in pages:
+        etag = client.get(url).headers['ETag']
+        status = client.get(url, headers={'If-None-Match': etag}).status_code
+        if status != 304:
+            failures.append('%s unchanged gave %d, not 304' % (url, status))
+        name = 'Renamed %s' % counterpart.__name__
+        with app.app_context():
+            counterpart.query.get(counterpart_id).name = name
+            db.session.commit()
+        response = client.get(url, headers={'If-None-Match': etag})
+        if response.status_code != 200 or name not in response.get_data(as_text=True):
+            failures.append('%s after renaming its %s gave %d' % (url, counterpart.__name__.lower(), response.status_code))
+
+    for failure in failures:
+        print('FAIL', failure)
+    print('%d checks failed' % len(failures))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
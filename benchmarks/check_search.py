@@ -0,0 +1,63 @@
+"""Check that both search backends return the same venues and artists.
+
+Runs every term through trigram_search (pg_trgm, what PostgreSQL serves)
+and the in-memory n-gram fallback over the same PostgreSQL database, and
+lists the terms whose matches differ. The terms cover names, cities,
+states, genres in any case, partial genres, "city, state" and LIKE
+wildcards. Exits with status 1 on any difference.
+
+    python benchmarks/check_search.py --database postgresql://localhost/fyyur_bench
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, Venue, Artist
+from search import trigram_search, ngram_search
+
+TERMS = [
+    'band', 'sax', 'Wild Sax', 'zzq', 'San Francisco', 'san francisco, ca', 'New Orleans, LA',
+    'CA', 'ny', 'Jazz', 'jazz', 'JAZZ', 'jaz', 'Hip-Hop', 'rock n roll',
+    '%', '_', 'a%', 'C_', '\\', 'e',
+]
+
+
+def matches(search, model, term):
+    # one page holding every match
+    result = search(model, term, 1, 10 ** 9)
+    return result.count, {row['id'] for row in result.data}
+
+def sample_terms(model):
+    # a word of a name, a city and a state that exist in the database
+    row = db.session.query(model.name, model.city, model.state).order_by(model.id).first()
+    return [row.name.split()[0], row.city, row.state] if row else []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default=os.environ.get('DATABASE_URL'))
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database, 'PAGE_CACHE_TYPE': None})
+    differences = 0
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            sys.exit('check_search.py needs a PostgreSQL database with pg_trgm')
+        print('%-8s %-20s %10s %10s' % ('table', 'term', 'trigram', 'ngram'))
+        for model in (Venue, Artist):
+            for term in TERMS + sample_terms(model):
+                trigram_count, trigram_ids = matches(trigram_search, model, term)
+                ngram_count, ngram_ids = matches(ngram_search, model, term)
+                same = trigram_count == ngram_count and trigram_ids == ngram_ids
+                differences += not same
+                print('%-8s %-20r %10d %10d%s' % (model.__tablename__, term, trigram_count, ngram_count,
+                                                   '' if same else '  differ: %s' % sorted(trigram_ids ^ ngram_ids)[:10]))
+    print('%d terms differ' % differences)
+    sys.exit(1 if differences else 0)
+
+
+if __name__ == '__main__':
+    main()
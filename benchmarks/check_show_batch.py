@@ -0,0 +1,72 @@
+"""Check that /shows/create/batch lists a tour through the real form.
+
+Builds the app on a temporary SQLite database with CSRF protection on,
+as it runs in production, seeds a venue and an artist, then GETs the
+batch form, POSTs three shows with the token from the page and checks
+they were inserted. A POST without the token must be rejected with its
+error shown, and a double booking must insert nothing. Exits with
+status 1 on any failure.
+
+    python benchmarks/check_show_batch.py
+"""
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models import db, Venue, Artist, Show
+
+TOUR = '{artist}, {venue}, 2031-06-01 20:00\n{artist}, {venue}, 2031-06-02 20:00\n{artist}, {venue}, 2031-06-03 20:00'
+DOUBLE_BOOKED = '{artist}, {venue}, 2031-06-01 21:00'
+
+
+def csrf_token(client):
+    page = client.get('/shows/create/batch').get_data(as_text=True)
+    match = re.search(r'name="csrf_token" type="hidden" value="([^"]+)"', page)
+    return match.group(1) if match else None
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), 'check_show_batch.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + path, 'WTF_CSRF_ENABLED': True, 'PAGE_CACHE_TYPE': None})
+    with app.app_context():
+        db.create_all()
+        venue = Venue(name='Batch Hall', city='San Francisco', state='CA', address='1 Main St', genres=['Jazz'])
+        artist = Artist(name='Batch Band', city='San Francisco', state='CA', genres=['Jazz'])
+        db.session.add_all([venue, artist])
+        db.session.commit()
+        ids = {'venue': venue.id, 'artist': artist.id}
+
+    def shows():
+        with app.app_context():
+            return Show.query.count()
+
+    failures = []
+    client = app.test_client()
+    token = csrf_token(client)
+    if token is None:
+        failures.append('the batch form renders no CSRF token')
+
+    response = client.post('/shows/create/batch', data={'shows': TOUR.format(**ids)})
+    if response.status_code != 400 or 'csrf_token' not in response.get_data(as_text=True) or shows():
+        failures.append('a POST without the token gave %d and inserted %d shows' % (response.status_code, shows()))
+
+    response = client.post('/shows/create/batch', data={'csrf_token': token, 'shows': TOUR.format(**ids)})
+    if response.status_code != 200 or shows() != 3:
+        failures.append('the tour gave %d and inserted %d of 3 shows' % (response.status_code, shows()))
+
+    response = client.post('/shows/create/batch', data={'csrf_token': token, 'shows': DOUBLE_BOOKED.format(**ids)})
+    if response.status_code != 409 or shows() != 3:
+        failures.append('a double booking gave %d and left %d shows' % (response.status_code, shows()))
+
+    for failure in failures:
+        print('FAIL', failure)
+    print('%d checks failed' % len(failures))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Seed a database with synthetic venues, artists and shows.
+
+States, genres and popularity follow skewed (Zipf-like) distributions over
+``state_choices`` and ``genres_choices`` from forms.py: a few states hold
+most venues, a few genres most acts, and a few popular venues and artists
+most shows. Shows spread over the past year and the next six months.
+
+    python benchmarks/synthetic.py --database postgresql://localhost/fyyur_bench \\
+        --venues 2000 --artists 10000 --shows 200000
+
+SQLite databases get their tables created; others must be migrated first
+(``flask db upgrade``).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from forms import state_choices, genres_choices
+from models import db, Venue, Artist, Show
+from stats import rebuild_stats
+
+CITIES = {
+    'CA': ['San Francisco', 'Los Angeles', 'San Diego', 'Oakland', 'Sacramento'],
+    'NY': ['New York', 'Brooklyn', 'Buffalo', 'Rochester'],
+    'TX': ['Austin', 'Houston', 'Dallas', 'San Antonio'],
+    'TN': ['Nashville', 'Memphis', 'Knoxville'],
+    'IL': ['Chicago', 'Springfield'],
+    'LA': ['New Orleans', 'Baton Rouge'],
+    'WA': ['Seattle', 'Spokane', 'Tacoma'],
+    'CO': ['Denver', 'Boulder'],
+    'GA': ['Atlanta', 'Savannah'],
+    'FL': ['Miami', 'Orlando', 'Tampa'],
+}
+WORDS = [
+    'the', 'wild', 'sax', 'band', 'guns', 'petals', 'musical', 'hop', 'park', 'square', 'live',
+    'dueling', 'pianos', 'electric', 'velvet', 'midnight', 'river', 'echo', 'neon', 'lions',
+    'silver', 'quartet', 'orchestra', 'collective', 'brothers', 'sisters', 'trio', 'club'
+]
+VENUE_WORDS = ['Hall', 'Room', 'Lounge', 'Theatre', 'Club', 'Ballroom', 'Tavern', 'Stage']
+BATCH_SIZE = 10000
+
+
+def zipf_weights(count, exponent=1.1):
+    # cumulative, so random.choices does not re-add them on every draw
+    return list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+class Generator(object):
+
+    def __init__(self, seed=1):
+        self.rng = random.Random(seed)
+        # the big music states first, then the rest of state_choices
+        states = [state for state, _ in state_choices]
+        self.states = list(CITIES) + [state for state in states if state not in CITIES]
+        self.state_weights = zipf_weights(len(self.states))
+        self.genres = [genre for genre, _ in genres_choices]
+        self.rng.shuffle(self.genres)
+        self.genre_weights = zipf_weights(len(self.genres))
+
+    def place(self):
+        state = self.rng.choices(self.states, cum_weights=self.state_weights)[0]
+        cities = CITIES.get(state) or ['%s City' % state, 'Port %s' % state]
+        return self.rng.choice(cities), state
+
+    def genre_list(self):
+        genres = set(self.rng.choices(self.genres, cum_weights=self.genre_weights, k=self.rng.randint(1, 3)))
+        return sorted(genres)
+
+    def name(self, number, suffix=''):
+        words = ' '.join(self.rng.choice(WORDS) for _ in range(self.rng.randint(1, 3))).title()
+        return '%s%s %d' % (words, suffix, number)
+
+    def venues(self, count, now):
+        for number in range(count):
+            city, state = self.place()
+            yield {
+                'name': self.name(number, ' ' + self.rng.choice(VENUE_WORDS)),
+                'city': city,
+                'state': state,
+                'address': '%d %s St' % (self.rng.randint(1, 9999), self.rng.choice(WORDS).title()),
+                'phone': '%03d-%03d-%04d' % (self.rng.randint(200, 999), self.rng.randint(0, 999), self.rng.randint(0, 9999)),
+                'genres': self.genre_list(),
+                'seeking_talent': self.rng.random() < 0.3,
+                'updated_at': now,
+            }
+
+    def artists(self, count, now):
+        for number in range(count):
+            city, state = self.place()
+            yield {
+                'name': self.name(number),
+                'city': city,
+                'state': state,
+                'phone': '%03d-%03d-%04d' % (self.rng.randint(200, 999), self.rng.randint(0, 999), self.rng.randint(0, 9999)),
+                'genres': self.genre_list(),
+                'seeking_venue': self.rng.random() < 0.3,
+                'updated_at': now,
+            }
+
+    def shows(self, count, venue_ids, artist_ids, now):
+        venue_weights = zipf_weights(len(venue_ids), 0.8)
+        artist_weights = zipf_weights(len(artist_ids), 0.8)
+        for _ in range(count):
+            yield {
+                'venue_id': self.rng.choices(venue_ids, cum_weights=venue_weights)[0],
+                'artist_id': self.rng.choices(artist_ids, cum_weights=artist_weights)[0],
+                'start_time': (now + timedelta(hours=self.rng.randint(-365 * 24, 183 * 24))).replace(minute=0, second=0, microsecond=0),
+            }
+
+
+def insert(model, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(model.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(model.__table__.insert(), batch)
+    db.session.commit()
+
+def seed(venues=500, artists=2000, shows=20000, random_seed=1):
+    """Insert the given volumes; call inside an app context."""
+    if db.engine.dialect.name == 'sqlite':
+        db.create_all()
+    generator = Generator(random_seed)
+    now = datetime.utcnow()
+    insert(Venue, generator.venues(venues, now))
+    insert(Artist, generator.artists(artists, now))
+    venue_ids = [id for id, in db.session.query(Venue.id).order_by(Venue.id)]
+    artist_ids = [id for id, in db.session.query(Artist.id).order_by(Artist.id)]
+    insert(Show, generator.shows(shows, venue_ids, artist_ids, now))
+    # the inserts bypass the Show events that keep the counts
+    rebuild_stats()
+    db.session.commit()
+    return venue_ids, artist_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', required=True)
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--artists', type=int, default=2000)
+    parser.add_argument('--shows', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database})
+    with app.app_context():
+        start = time.perf_counter()
+        seed(args.venues, args.artists, args.shows, args.seed)
+        print('seeded %d venues, %d artists, %d shows in %.1f s'
+              % (args.venues, args.artists, args.shows, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
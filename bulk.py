@@ -0,0 +1,299 @@
+#----------------------------------------------------------------------------#
+# Bulk import/export commands.
+#
+#   flask data import venues venues.csv
+#   flask data import shows shows.ndjson --batch-size 50000
+#   flask data export shows shows.csv
+#
+# Files are streamed in batches, one transaction per batch. PostgreSQL is
+# loaded with COPY; other databases with a single executemany per batch.
+# Shows may name their venue and artist instead of giving ids; both are
+# resolved through lookup maps built once from one query per table.
+# A row with a value that does not convert, or without one of its table's
+# required values, is rejected and counted; the rest of its batch loads.
+#----------------------------------------------------------------------------#
+
+import csv
+import io
+import json
+import time
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+from models import db, Venue, Artist, Show, VenueStats, ArtistStats, record_changes
+from stats import rebuild_stats
+
+data_cli = AppGroup('data', help='Bulk import and export of venues, artists and shows.')
+
+TABLES = {
+    'venues': (Venue, ['id', 'name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link', 'genres',
+                       'website', 'seeking_talent', 'seeking_description']),
+    'artists': (Artist, ['id', 'name', 'city', 'state', 'phone', 'image_link', 'facebook_link', 'genres',
+                         'website', 'seeking_venue', 'seeking_description']),
+    'shows': (Show, ['id', 'venue_id', 'artist_id', 'start_time']),
+}
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+
+
+def detect_format(path, file_format):
+    if file_format:
+        return file_format
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+def read_records(stream, file_format):
+    if file_format == 'csv':
+        for record in csv.DictReader(stream):
+            yield record
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+def batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+#  Conversion
+#  ----------------------------------------------------------------
+
+def convert_value(column, value):
+    if value is None or value == '':
+        return None
+    if column in ('id', 'venue_id', 'artist_id'):
+        return int(value)
+    if column == 'genres':
+        return value if isinstance(value, list) else [genre.strip() for genre in value.split(',') if genre.strip()]
+    if column in ('seeking_talent', 'seeking_venue'):
+        return value if isinstance(value, bool) else str(value).strip().lower() in TRUE_VALUES
+    if column == 'start_time':
+        return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    return value
+
+class ShowKeys(object):
+    """Resolves show venue/artist references to ids.
+
+    Records may carry venue_id/artist_id, or venue/artist names. Both
+    tables are read once into memory; an unknown reference, or a name
+    shared by several venues or artists, rejects the row instead of
+    failing the batch on a foreign key error. The shared names met are
+    kept in ambiguous to be reported.
+    """
+
+    def __init__(self):
+        self.venues, self.venue_ids = self.read_names(Venue)
+        self.artists, self.artist_ids = self.read_names(Artist)
+        self.ambiguous = set()
+        # the venues and artists the imported shows belong to
+        self.used_venue_ids = set()
+        self.used_artist_ids = set()
+
+    @staticmethod
+    def read_names(model):
+        names = {}
+        ids = set()
+        for name, id in db.session.query(model.name, model.id):
+            # a name shared by several rows maps to None
+            names[name] = None if name in names else id
+            ids.add(id)
+        return names, ids
+
+    def lookup(self, names, name, kind):
+        if name is None:
+            return None
+        id = names.get(name)
+        if id is None and name in names:
+            self.ambiguous.add('%s %r' % (kind, name))
+        return id
+
+    def resolve(self, record):
+        venue_id = convert_value('venue_id', record.get('venue_id')) or self.lookup(self.venues, record.get('venue'), 'venue')
+        artist_id = convert_value('artist_id', record.get('artist_id')) or self.lookup(self.artists, record.get('artist'), 'artist')
+        if venue_id not in self.venue_ids or artist_id not in self.artist_ids:
+            return None
+        record['venue_id'] = venue_id
+        record['artist_id'] = artist_id
+        return record
+
+    def record_used(self, rows):
+        self.used_venue_ids.update(row['venue_id'] for row in rows)
+        self.used_artist_ids.update(row['artist_id'] for row in rows)
+
+def required_columns(model, columns):
+    # the NOT NULL columns the file must fill; updated_at and the ids are
+    # filled in by the import or the database
+    table = model.__table__
+    return [column for column in columns
+            if not table.c[column].nullable and not table.c[column].primary_key and table.c[column].default is None]
+
+def convert_batch(records, columns, required=(), show_keys=None):
+    rows = []
+    rejected = 0
+    for record in records:
+        try:
+            if show_keys is not None:
+                record = show_keys.resolve(record)
+                if record is None:
+                    rejected += 1
+                    continue
+            row = {column: convert_value(column, record.get(column)) for column in columns}
+            if any(row[column] is None for column in required):
+                raise ValueError('missing required value')
+            rows.append(row)
+        except (ValueError, TypeError):
+            rejected += 1
+    return rows, rejected
+
+
+#  Loading
+#  ----------------------------------------------------------------
+
+def copy_text(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return '{' + ','.join('"%s"' % item.replace('\\', '\\\\').replace('"', '\\"') for item in value) + '}'
+    return str(value)
+
+def copy_rows(model, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([copy_text(row[column]) for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(
+        'COPY "%s" (%s) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')' % (model.__tablename__, ', '.join(columns)),
+        buffer
+    )
+
+def insert_rows(model, columns, rows):
+    db.session.execute(model.__table__.insert(), rows)
+
+def reset_sequence(model):
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(
+            "SELECT setval(pg_get_serial_sequence('\"%s\"', 'id'), coalesce(max(id), 1)) FROM \"%s\""
+            % (model.__tablename__, model.__tablename__)
+        )
+
+def touch_show_parents(venue_ids, artist_ids):
+    # COPY and executemany skip the Show mapper events, so bump the
+    # versions of the imported shows' venues and artists here
+    now = datetime.utcnow()
+    ids = {VenueStats: sorted(venue_ids), ArtistStats: sorted(artist_ids)}
+    for model, stats in ((Venue, VenueStats), (Artist, ArtistStats)):
+        db.session.query(model).filter(model.id.in_(ids[stats])) \
+            .update({model.updated_at: now}, synchronize_session=False)
+    # and recount their shows
+    rebuild_stats(ids)
+
+
+@data_cli.command('import')
+@click.argument('table', type=click.Choice(sorted(TABLES)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=10000, show_default=True)
+def import_command(table, source, file_format, batch_size):
+    """Stream a CSV or NDJSON file into a table."""
+    model, columns = TABLES[table]
+    file_format = detect_format(getattr(source, 'name', ''), file_format)
+    show_keys = ShowKeys() if model is Show else None
+    if model is not Show:
+        columns = columns + ['updated_at']
+    required = required_columns(model, columns)
+    load = copy_rows if db.engine.dialect.name == 'postgresql' else insert_rows
+
+    started = time.time()
+    total = rejected = 0
+    explicit_ids = False
+    for number, records in enumerate(batches(read_records(source, file_format), batch_size), 1):
+        rows, batch_rejected = convert_batch(records, columns, required, show_keys)
+        rejected += batch_rejected
+        if not rows:
+            continue
+        if 'updated_at' in columns:
+            now = datetime.utcnow()
+            for row in rows:
+                row['updated_at'] = now
+        with_ids = [row for row in rows if row['id'] is not None]
+        without_ids = [row for row in rows if row['id'] is None]
+        if with_ids:
+            explicit_ids = True
+            load(model, columns, with_ids)
+        if without_ids:
+            load(model, columns[1:], [{column: row[column] for column in columns[1:]} for row in without_ids])
+        if show_keys is not None:
+            show_keys.record_used(rows)
+        record_changes(db.session, {model})
+        db.session.commit()
+        total += len(rows)
+        elapsed = time.time() - started
+        click.echo('%s: batch %d, %d rows imported, %d rejected, %.0f rows/s'
+                   % (table, number, total, rejected, total / elapsed if elapsed else total), err=True)
+
+    if explicit_ids:
+        reset_sequence(model)
+    if model is Show and total:
+        touch_show_parents(show_keys.used_venue_ids, show_keys.used_artist_ids)
+    record_changes(db.session, {model})
+    db.session.commit()
+    click.echo('%s: %d rows imported, %d rejected in %.1fs' % (table, total, rejected, time.time() - started), err=True)
+    if show_keys is not None and show_keys.ambiguous:
+        click.echo('%s: rows rejected for naming one of several rows with the same name: %s'
+                   % (table, ', '.join(sorted(show_keys.ambiguous))), err=True)
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+def export_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return ','.join(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+@data_cli.command('export')
+@click.argument('table', type=click.Choice(sorted(TABLES)))
+@click.argument('target', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=10000, show_default=True)
+def export_command(table, target, file_format, batch_size):
+    """Stream a table out as CSV or NDJSON (to stdout by default)."""
+    model, columns = TABLES[table]
+    file_format = detect_format(getattr(target, 'name', ''), file_format)
+    query = db.session.query(*[getattr(model, column) for column in columns]) \
+        .order_by(model.id) \
+        .execution_options(stream_results=True) \
+        .yield_per(batch_size)
+    started = time.time()
+    if file_format == 'csv':
+        writer = csv.writer(target)
+        writer.writerow(columns)
+    total = 0
+    for row in query:
+        if file_format == 'csv':
+            writer.writerow([export_text(value) for value in row])
+        else:
+            target.write(json.dumps(dict(zip(columns, row)), default=export_text) + '\n')
+        total += 1
+        if total % batch_size == 0:
+            click.echo('%s: %d rows exported' % (table, total), err=True)
+    target.flush()
+    click.echo('%s: %d rows exported in %.1fs' % (table, total, time.time() - started), err=True)
@@ -0,0 +1,159 @@
+#----------------------------------------------------------------------------#
+# Page cache.
+#
+# Rendered GET responses are cached per path and query string, and the
+# whole cache is dropped whenever a Venue, Artist or Show write commits
+# (see on_models_committed in models.py), so the create/edit handlers
+# never leave a stale listing or detail page behind.
+#
+# The in-process LRU backend is private to each worker process; use the
+# file backend when several workers must see each other's invalidations.
+#----------------------------------------------------------------------------#
+
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from hashlib import sha1
+
+from flask import request, session
+
+from models import on_models_committed
+
+
+class LRUCache(object):
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires and expires < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        with self.lock:
+            self.entries[key] = (value, time.time() + timeout if timeout else None)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class FileCache(object):
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, sha1(key.encode('utf-8')).hexdigest() + '.cache')
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'rb') as f:
+                value, expires = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if expires and expires < time.time():
+            return None
+        return value
+
+    def set(self, key, value, timeout=None):
+        # write to a temporary file first so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((value, time.time() + timeout if timeout else None), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.cache'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith('.cache'))
+
+
+class PageCache(object):
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.timeout = None
+        # the counters are shared by the request threads
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config.get('PAGE_CACHE_TYPE', 'lru')
+        self.backend = None
+        if cache_type == 'lru':
+            self.backend = LRUCache(app.config.get('PAGE_CACHE_SIZE', 512))
+        elif cache_type == 'file':
+            self.backend = FileCache(app.config.get('PAGE_CACHE_DIR') or os.path.join(app.instance_path, 'page_cache'))
+        self.timeout = app.config.get('PAGE_CACHE_TIMEOUT')
+        app.extensions['page_cache'] = self
+        on_models_committed(self.invalidate)
+
+    def invalidate(self, models=None):
+        if self.backend is not None:
+            self.backend.clear()
+            with self.lock:
+                self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            hits, misses, invalidations = self.hits, self.misses, self.invalidations
+        return {
+            'backend': type(self.backend).__name__ if self.backend is not None else None,
+            'entries': len(self.backend) if self.backend is not None else 0,
+            'hits': hits,
+            'misses': misses,
+            'invalidations': invalidations
+        }
+
+    def cached(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # pending flash messages are rendered into the page, so those
+            # responses are neither served from nor stored in the cache
+            if self.backend is None or request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+            key = request.full_path
+            body = self.backend.get(key)
+            if body is not None:
+                with self.lock:
+                    self.hits += 1
+                return body
+            with self.lock:
+                self.misses += 1
+            body = view(*args, **kwargs)
+            if isinstance(body, str):
+                self.backend.set(key, body, self.timeout)
+            return body
+        return wrapper
@@ -0,0 +1,90 @@
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#
+# Each cached route gets a strong ETag and a Last-Modified date computed
+# from a version query of primary key and index lookups. A matching
+# If-None-Match (or If-Modified-Since) is answered with 304 before the
+# view runs its show queries or renders a template.
+#----------------------------------------------------------------------------#
+
+from functools import wraps
+from hashlib import sha1
+
+from flask import request, session, make_response, abort
+
+from models import db, Show, TableVersion
+
+
+def entity_version(model, show_key, counterpart, counterpart_key):
+    """Version of a venue or artist detail page.
+
+    The page changes when the entity is edited, when one of its shows is
+    written (both bump updated_at), when one of the counterparts its shows
+    list (the artists on a venue page, the venues on an artist page) is
+    edited, and when its next upcoming show starts and moves to the past
+    section, so that start time is part of the tag.
+    """
+    def version(**view_args):
+        entity_id = next(iter(view_args.values()))
+        now = db.func.now()
+        next_show = db.select([db.func.min(Show.start_time)]).where(db.and_(show_key==entity_id, Show.start_time > now)).as_scalar()
+        last_show = db.select([db.func.max(Show.start_time)]).where(db.and_(show_key==entity_id, Show.start_time <= now)).as_scalar()
+        # the counterparts' own rows, by primary key, for the entity's shows
+        counterparts = db.select([db.func.max(counterpart.updated_at)]) \
+            .where(counterpart.id.in_(db.select([counterpart_key]).where(show_key==entity_id))).as_scalar()
+        row = db.session.query(model.updated_at, next_show, last_show, counterparts).filter(model.id==entity_id).first()
+        if row is None:
+            abort(404)
+        updated_at, next_start, last_start, counterparts_updated_at = row
+        return (updated_at, next_start, counterparts_updated_at), \
+            max(updated_at, last_start or updated_at, counterparts_updated_at or updated_at)
+    return version
+
+def listing_version(*models):
+    """Version of a listing page built from the given models.
+
+    The models' TableVersion rows, which every committed write bumps (see
+    models.py), and the next show to move from upcoming to past: primary
+    key and index lookups, fetched in one round trip.
+    """
+    table = TableVersion.__table__
+    def version(**view_args):
+        columns = []
+        for model in models:
+            row = table.c.name==model.__tablename__
+            columns.append(db.select([table.c.version]).where(row).as_scalar())
+            columns.append(db.select([table.c.updated_at]).where(row).label('updated_at_%s' % model.__tablename__))
+        columns.append(db.select([db.func.min(Show.start_time)]).where(Show.start_time > db.func.now()).as_scalar())
+        row = db.session.query(*columns).one()
+        updated = [getattr(row, 'updated_at_%s' % model.__tablename__) for model in models]
+        updated = [value for value in updated if value is not None]
+        return tuple(row), max(updated) if updated else None
+    return version
+
+
+def conditional(version):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # pending flash messages are rendered into the page, so the
+            # cached copy a client holds is not what it would get now
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+            parts, last_modified = version(**kwargs)
+            etag = sha1(repr((request.full_path, parts)).encode('utf-8')).hexdigest()
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = bool(last_modified and request.if_modified_since
+                                    and last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None))
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
@@ -6,7 +6,108 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 # Enable debug mode.
 DEBUG = True
 
-# Connect to the database
+# Formatted strings kept by the datetime template filter (0 disables), and
+# the timezone it shows times in, e.g. 'America/New_York'. Naive times are
+# taken as UTC; None shows every time in the timezone it carries.
+DATETIME_FILTER_CACHE_SIZE = 4096
+DATETIME_FILTER_TIMEZONE = None
 
+# Rendered page cache: 'lru' (per process), 'file' (shared through
+# PAGE_CACHE_DIR) or None. Entries expire after PAGE_CACHE_TIMEOUT seconds
+# so shows still move from upcoming to past on cached pages.
+PAGE_CACHE_TYPE = 'lru'
+PAGE_CACHE_SIZE = 512
+PAGE_CACHE_DIR = None
+PAGE_CACHE_TIMEOUT = 60
 
-SQLALCHEMY_DATABASE_URI = 'postgresql://postgres: @localhost:5432/fyyur1'
+# SQL instrumentation: requests slower than this are logged to error.log
+# with their slowest statements; every response gets a Server-Timing
+# header with the query count and database time
+SQL_SLOW_REQUEST_MS = 500
+SQL_SLOWEST_STATEMENTS = 3
+SQL_SERVER_TIMING = True
+
+# Logging (logs.py, when DEBUG is off): JSON lines in LOG_FILE, rotated at
+# LOG_MAX_BYTES. Records are written by a background thread from a queue
+# of LOG_QUEUE_SIZE; past LOG_SAMPLE_AT of it one in LOG_BURST_SAMPLE is
+# kept, and a full queue drops them. With several worker processes put
+# {pid} in LOG_FILE so each rotates its own file.
+LOG_FILE = os.environ.get('LOG_FILE', 'error.log')
+LOG_LEVEL = 'INFO'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_QUEUE_SIZE = 10000
+LOG_SAMPLE_AT = 0.5
+LOG_BURST_SAMPLE = 10
+LOG_REQUESTS = True
+
+# Detail pages load their entity and its shows at the same time on
+# separate connections, using up to READ_QUERY_THREADS threads
+CONCURRENT_READ_QUERIES = True
+READ_QUERY_THREADS = 16
+
+# ASGI serving (asgi.py): requests in flight for read-only views and for
+# everything else, and seconds a request may wait for a slot before a 503.
+# Keep the read limit near pool_size + max_overflow.
+ASGI_READ_CONCURRENCY = 30
+ASGI_WRITE_CONCURRENCY = 4
+ASGI_QUEUE_TIMEOUT = 10
+
+# Search box suggestions (autocomplete.py) come from an in-memory index,
+# rebuilt after this many seconds to take in writes from other processes
+AUTOCOMPLETE_MAX_AGE = 300
+
+# Suggested matches between seeking venues and artists (matching.py) come
+# from in-memory arrays, rebuilt after this many seconds likewise
+MATCHING_MAX_AGE = 300
+
+# Shows at the same venue, or by the same artist, closer together than
+# this are rejected as double bookings
+SHOW_CONFLICT_WINDOW_HOURS = 4
+
+# Show partitions on PostgreSQL (see partitions.py): `flask partitions
+# maintain` keeps partitions of this many months created this far ahead,
+# and archives those that ended SHOW_ARCHIVE_AFTER_MONTHS ago (None keeps
+# every show)
+SHOW_PARTITION_MONTHS = 3
+SHOW_PARTITIONS_AHEAD_MONTHS = 12
+SHOW_ARCHIVE_AFTER_MONTHS = None
+
+# Relationship loading (see loading.py). A profile gives the strategy,
+# 'selectin', 'joined', 'subquery', 'lazy' or 'raise', of relationship
+# paths from its model. With SQLALCHEMY_RAISE_ON_LAZY_LOAD a relationship
+# walked without being loaded raises instead of querying once per object;
+# it is meant for development and test runs, so it is off unless
+# SQLALCHEMY_RAISE_ON_LAZY_LOAD=1 is set in the environment.
+SQLALCHEMY_LOADER_PROFILES = {
+    # the detail pages fetch shows with their own query (queries.py)
+    'venue_detail': ('Venue', {'Show': 'raise'}),
+    'artist_detail': ('Artist', {'Show': 'raise'}),
+    'venue_shows': ('Venue', {'Show': 'selectin', 'Show.artist': 'joined'}),
+    'artist_shows': ('Artist', {'Show': 'selectin', 'Show.venue': 'joined'}),
+}
+SQLALCHEMY_RAISE_ON_LAZY_LOAD = os.environ.get('SQLALCHEMY_RAISE_ON_LAZY_LOAD', '0') != '0'
+
+# Connect to the database. DATABASE_URL overrides the local default and
+# DATABASE_REPLICA_URLS lists comma separated read replicas for the GET
+# pages (see routing.py); without replicas everything uses the primary.
+SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'postgresql://postgres: @localhost:5432/fyyur1')
+SQLALCHEMY_REPLICA_URIS = [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()]
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool, applied to the primary and each replica. pool_size,
+# max_overflow and pool_timeout are ignored for SQLite. pool_pre_ping
+# checks a connection before handing it out, so a restarted database
+# costs one reconnect instead of a failed request.
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+    'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+    'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') != '0',
+}
+
+# Seconds a failed replica is skipped, and seconds a client reads from
+# the primary after its own write
+REPLICA_RETRY_SECONDS = 30
+REPLICA_STICKY_SECONDS = 5
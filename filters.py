@@ -0,0 +1,42 @@
+#----------------------------------------------------------------------------#
+# Template filters.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from functools import lru_cache
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma"
+}
+
+@lru_cache(maxsize=None)
+def get_datetime_settings(locale, tzinfo):
+    # looked up once per (locale, timezone) instead of on every call; babel
+    # and its locale data are loaded by the first page that shows a date
+    import babel.dates
+    return babel.Locale.parse(locale or babel.dates.LC_TIME), babel.dates.get_timezone(tzinfo) if tzinfo else None
+
+def format_datetime(value, format='medium', locale=None, tzinfo=None):
+    """Format a datetime or ISO string with babel in the timezone tzinfo.
+
+    Naive values are taken as UTC. Without tzinfo, values are shown in
+    the timezone they carry.
+    """
+    import babel.dates
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    locale, tzinfo = get_datetime_settings(locale, tzinfo)
+    # babel caches the parsed pattern
+    return babel.dates.format_datetime(value, DATETIME_FORMATS.get(format, format), tzinfo=tzinfo, locale=locale)
+
+def init_app(app):
+    tzinfo = app.config.get('DATETIME_FILTER_TIMEZONE')
+
+    def datetime_filter(value, format='medium', locale=None):
+        return format_datetime(value, format, locale, tzinfo)
+
+    if app.config.get('DATETIME_FILTER_CACHE_SIZE'):
+        app.jinja_env.filters['datetime'] = lru_cache(maxsize=app.config['DATETIME_FILTER_CACHE_SIZE'])(datetime_filter)
+    else:
+        app.jinja_env.filters['datetime'] = datetime_filter
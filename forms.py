@@ -1,6 +1,6 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
+from wtforms import StringField, IntegerField, SelectField, SelectMultipleField, DateTimeField, BooleanField, TextAreaField
 from wtforms.validators import DataRequired, AnyOf, URL
 
 state_choices=[
@@ -79,10 +79,10 @@ genres_choices=[
     ('Other', 'Other'),
 ]
 class ShowForm(Form):
-    artist_id = StringField(
+    artist_id = IntegerField(
         'artist_id'
     )
-    venue_id = StringField(
+    venue_id = IntegerField(
         'venue_id'
     )
     start_time = DateTimeField(
@@ -91,6 +91,11 @@ class ShowForm(Form):
         default= datetime.today()
     )
 
+class ShowBatchForm(Form):
+    shows = TextAreaField(
+        'shows', validators=[DataRequired()]
+    )
+
 class VenueForm(Form):
     name = StringField(
         'name', validators=[DataRequired()]
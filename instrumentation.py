@@ -0,0 +1,142 @@
+#----------------------------------------------------------------------------#
+# Per-request SQL instrumentation.
+#
+# Every statement run on any engine (primary or replica) is timed through
+# the cursor execute events and charged to the request that ran it. Each
+# response carries a Server-Timing header with the query count and the
+# database time, and requests slower than SQL_SLOW_REQUEST_MS are logged
+# to app.logger (error.log) with their slowest statements. Streamed API
+# lists run their query after the headers are sent and are not counted.
+#
+# query_budget() applies the same counting to a block of code, so a test
+# can fail when a route starts issuing one query per row again:
+#
+#     with query_budget(3):
+#         client.get('/venues')
+#----------------------------------------------------------------------------#
+
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# QueryStats collecting on the current thread: the request's and any
+# query_budget() blocks
+active = threading.local()
+
+
+class QueryStats(object):
+
+    def __init__(self, keep=3):
+        self.count = 0
+        self.duration = 0.0
+        self.keep = keep
+        self.slowest = []
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        # min-heap of the slowest statements seen so far
+        entry = (duration, self.count, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        elif self.keep:
+            heapq.heappushpop(self.slowest, entry)
+
+    def slowest_statements(self):
+        return [(duration, statement) for duration, _, statement in sorted(self.slowest, reverse=True)]
+
+    def describe(self):
+        return '\n'.join('  %.1fms %s' % (duration * 1000, ' '.join(statement.split()))
+                         for duration, statement in self.slowest_statements())
+
+
+def collectors():
+    if not hasattr(active, 'stats'):
+        active.stats = []
+    return active.stats
+
+@contextmanager
+def charged_to(stats):
+    # queries a helper thread runs on behalf of a request count for it
+    previous = collectors()
+    active.stats = stats
+    try:
+        yield
+    finally:
+        active.stats = previous
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_timer(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_started'].pop()
+    for stats in collectors():
+        stats.record(statement, duration)
+
+@event.listens_for(Engine, 'handle_error')
+def discard_timer(context):
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+@contextmanager
+def query_budget(limit):
+    """Fail with AssertionError when the block runs more than limit queries."""
+    stats = QueryStats(keep=limit + 1)
+    collectors().append(stats)
+    try:
+        yield stats
+    finally:
+        collectors().remove(stats)
+    if stats.count > limit:
+        raise AssertionError('%d queries run, budget is %d; slowest:\n%s' % (stats.count, limit, stats.describe()))
+
+
+class SQLInstrumentation(object):
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_SLOW_REQUEST_MS', 500)
+        app.config.setdefault('SQL_SLOWEST_STATEMENTS', 3)
+        app.config.setdefault('SQL_SERVER_TIMING', True)
+        self.app = app
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.teardown_request(self.teardown_request)
+        app.extensions['sql_instrumentation'] = self
+
+    def start_request(self):
+        g.sql_started = time.perf_counter()
+        g.sql_stats = QueryStats(keep=self.app.config['SQL_SLOWEST_STATEMENTS'])
+        collectors().append(g.sql_stats)
+
+    def finish_request(self, response):
+        stats = g.get('sql_stats')
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - g.sql_started
+        if self.app.config['SQL_SERVER_TIMING']:
+            response.headers.add('Server-Timing', 'db;dur=%.1f;desc="%d queries", app;dur=%.1f'
+                                 % (stats.duration * 1000, stats.count, elapsed * 1000))
+        if elapsed * 1000 >= self.app.config['SQL_SLOW_REQUEST_MS']:
+            self.app.logger.warning('slow request %s %s: %.0fms, %d queries in %.0fms\n%s' % (
+                request.method, request.full_path.rstrip('?'), elapsed * 1000, stats.count, stats.duration * 1000,
+                stats.describe()
+            ))
+        return response
+
+    def teardown_request(self, exception=None):
+        stats = g.pop('sql_stats', None)
+        if stats is not None and stats in collectors():
+            collectors().remove(stats)
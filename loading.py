@@ -0,0 +1,69 @@
+#----------------------------------------------------------------------------#
+# Relationship loading.
+#
+# Venue.Show, Artist.Show and their venue/artist backrefs are lazy, so
+# walking them costs one SELECT per object. Queries that walk them name a
+# profile from SQLALCHEMY_LOADER_PROFILES instead:
+#
+#   db.session.query(Venue).options(*loader_options('venue_shows'))
+#
+# With SQLALCHEMY_RAISE_ON_LAZY_LOAD every ORM query defaults to
+# raiseload('*', sql_only=True): a relationship its profile did not load
+# raises when touched instead of querying, unless the object it points to
+# is already in the session.
+#----------------------------------------------------------------------------#
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, orm
+from sqlalchemy.orm import Query, raiseload
+
+import models
+
+# strategy name -> loader option, a function in sqlalchemy.orm and a
+# method of the Load objects it returns
+STRATEGIES = {
+    'selectin': 'selectinload',
+    'joined': 'joinedload',
+    'subquery': 'subqueryload',
+    'lazy': 'lazyload',
+    'raise': 'raiseload',
+}
+
+
+def build_options(model_name, paths):
+    """Loader options for a profile: {'Show': 'selectin', 'Show.artist': 'joined'}.
+
+    A dotted path is reached through its parents' own options, so each
+    level of a profile keeps the strategy it was given.
+    """
+    options = []
+    for path, strategy in sorted(paths.items()):
+        if strategy not in STRATEGIES:
+            raise ValueError('Unknown loader strategy %r for %s.%s' % (strategy, model_name, path))
+        entity = getattr(models, model_name)
+        names = path.split('.')
+        load = orm
+        for number, name in enumerate(names):
+            attribute = getattr(entity, name)
+            loader = STRATEGIES[strategy] if number == len(names) - 1 else 'defaultload'
+            load = getattr(load, loader)(attribute)
+            entity = attribute.property.mapper.class_
+        options.append(load)
+    return options
+
+def init_app(app):
+    app.extensions['loader_profiles'] = {
+        name: build_options(model_name, paths)
+        for name, (model_name, paths) in app.config.get('SQLALCHEMY_LOADER_PROFILES', {}).items()
+    }
+
+def loader_options(name):
+    return current_app.extensions['loader_profiles'][name]
+
+
+@event.listens_for(Query, 'before_compile', retval=True, bake_ok=True)
+def raise_on_lazy_load(query):
+    if has_app_context() and current_app.config.get('SQLALCHEMY_RAISE_ON_LAZY_LOAD'):
+        # explicit options, the profiles included, take precedence over the wildcard
+        return query.options(raiseload('*', sql_only=True))
+    return query
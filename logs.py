@@ -0,0 +1,203 @@
+#----------------------------------------------------------------------------#
+# Application logging.
+#
+# app.logger writes JSON lines to LOG_FILE, rotated at LOG_MAX_BYTES with
+# LOG_BACKUP_COUNT old files kept. A request thread only puts its records
+# on a bounded queue; a listener thread formats them and does the disk
+# I/O. Records logged during a request carry its id (the X-Request-ID
+# header, or a new one, echoed on the response) and its latency so far,
+# and with LOG_REQUESTS each finished request is logged with its status
+# and total latency:
+#
+#   {"time": "...", "level": "ERROR", "message": "...", "request_id": "...",
+#    "method": "GET", "path": "/venues/1", "latency_ms": 12.3, ...}
+#
+# Logging never stalls a worker: past LOG_SAMPLE_AT of LOG_QUEUE_SIZE
+# queued records, only one in LOG_BURST_SAMPLE is kept, and once the
+# queue is full records are dropped. The count of records lost is logged
+# when the backlog clears.
+#
+# The listener starts in the process that first logs, so with a
+# preloading server each worker runs its own. Workers must not rotate
+# the same file: give LOG_FILE a {pid} placeholder when there are several.
+#----------------------------------------------------------------------------#
+
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import current_app, g, request, has_request_context
+from flask.logging import default_handler
+
+# the record attributes every LogRecord has; any others came from extra=
+STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, with the fields given through extra=."""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'source': '%s:%d' % (record.pathname, record.lineno),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        data.update((key, value) for key, value in vars(record).items() if key not in STANDARD_ATTRIBUTES)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = record.stack_info
+        return json.dumps(data, default=str)
+
+
+class SamplingQueueHandler(QueueHandler):
+    """A QueueHandler that never blocks: records are sampled as the queue
+    fills and dropped once it is full."""
+
+    def __init__(self, pipeline, sample_at, sample_every):
+        QueueHandler.__init__(self, None)
+        self.pipeline = pipeline
+        self.sample_at = sample_at
+        self.sample_every = sample_every
+        self.seen = 0
+        self.lost = 0
+
+    def prepare(self, record):
+        # runs on the logging thread, so the request is still at hand; the
+        # message and traceback are rendered here as the arguments and the
+        # exception may not outlive the request
+        if has_request_context() and 'request_id' in g:
+            record.__dict__.setdefault('request_id', g.request_id)
+            record.__dict__.setdefault('method', request.method)
+            record.__dict__.setdefault('path', request.path)
+            record.__dict__.setdefault('latency_ms', round((time.perf_counter() - g.request_started) * 1000, 1))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # Handler.handle holds self.lock around emit, so the counters are
+        # only touched by one thread at a time
+        self.queue = self.pipeline.start()
+        backlog = self.queue.qsize()
+        if backlog >= self.sample_at:
+            self.seen += 1
+            if self.seen % self.sample_every:
+                self.lost += 1
+                return
+        elif self.lost:
+            lost = logging.makeLogRecord({
+                'name': record.name, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+                'msg': '%d log records dropped while the log queue was backed up' % self.lost,
+            })
+            self.lost = self.seen = 0
+            self.put(lost)
+        self.put(record)
+
+    def put(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.lost += 1
+
+
+class LogPipeline(object):
+    """The queue and listener thread of the current process.
+
+    A forked child inherits neither the thread nor a usable queue, so
+    both are made again the first time a process logs.
+    """
+
+    def __init__(self, make_handler, size):
+        self.make_handler = make_handler
+        self.size = size
+        self.pid = None
+        self.queue = None
+        self.listener = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.queue = queue.Queue(self.size)
+                    self.listener = QueueListener(self.queue, self.make_handler(), respect_handler_level=True)
+                    self.listener.start()
+                    self.pid = os.getpid()
+        return self.queue
+
+    def stop(self):
+        # writes out what is queued; registered with atexit
+        if self.pid == os.getpid():
+            try:
+                self.listener.stop()
+            except queue.Full:
+                pass
+            self.listener.handlers[0].close()
+            self.pid = None
+
+
+def file_handler(app):
+    handler = RotatingFileHandler(
+        app.config['LOG_FILE'].format(pid=os.getpid()),
+        maxBytes=app.config['LOG_MAX_BYTES'],
+        backupCount=app.config['LOG_BACKUP_COUNT'],
+        delay=True,
+    )
+    handler.setFormatter(JSONFormatter())
+    handler.setLevel(app.config['LOG_LEVEL'])
+    return handler
+
+def start_request():
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.request_started = time.perf_counter()
+
+def finish_request(response):
+    request_id = g.get('request_id')
+    if request_id is None:
+        return response
+    response.headers.setdefault('X-Request-ID', request_id)
+    if current_app.config['LOG_REQUESTS']:
+        current_app.logger.info('%s %s %s', request.method, request.full_path.rstrip('?'), response.status_code,
+                                extra={'status': response.status_code})
+    return response
+
+
+def init_app(app):
+    app.config.setdefault('LOG_FILE', 'error.log')
+    app.config.setdefault('LOG_LEVEL', 'INFO')
+    app.config.setdefault('LOG_MAX_BYTES', 10 * 1024 * 1024)
+    app.config.setdefault('LOG_BACKUP_COUNT', 5)
+    app.config.setdefault('LOG_QUEUE_SIZE', 10000)
+    app.config.setdefault('LOG_SAMPLE_AT', 0.5)
+    app.config.setdefault('LOG_BURST_SAMPLE', 10)
+    app.config.setdefault('LOG_REQUESTS', True)
+
+    size = app.config['LOG_QUEUE_SIZE']
+    pipeline = LogPipeline(lambda: file_handler(app), size)
+    handler = SamplingQueueHandler(pipeline, int(size * app.config['LOG_SAMPLE_AT']), app.config['LOG_BURST_SAMPLE'])
+    handler.setLevel(app.config['LOG_LEVEL'])
+    app.logger.setLevel(app.config['LOG_LEVEL'])
+    # Flask's own handler writes to stderr on the request thread
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(handler)
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.extensions['logs'] = pipeline
+    atexit.register(pipeline.stop)
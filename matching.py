@@ -0,0 +1,306 @@
+#----------------------------------------------------------------------------#
+# Matchmaking.
+#
+# Suggested artists for a venue seeking talent, and suggested venues for
+# an artist seeking one (/api/v1/venues/<id>/matches and
+# /api/v1/artists/<id>/matches, shown on the detail pages).
+#
+# Every seeking venue and artist is a row of a few NumPy arrays: its id,
+# its genres as a bitmask over genres_choices, and codes for its city
+# and state. A lookup scores all the rows of the other side at once, as
+#
+#   GENRE_WEIGHT * shared genres + CITY_WEIGHT * same city + STATE_WEIGHT * same state
+#
+# counting the shared genres with a popcount table over every mask, and
+# cuts the best at the score a bincount finds, so no Python code runs
+# per row. Only profiles sharing a genre are suggested.
+#
+# As with autocomplete.py, each app builds its arrays on first use,
+# applies the Venue and Artist writes this process commits in place, and
+# rebuilds in the background MATCHING_MAX_AGE seconds after the last
+# build to take in writes from other processes.
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+from forms import genres_choices
+from models import db, Venue, Artist
+
+VENUE, ARTIST = 0, 1
+
+GENRE_BITS = {genre.lower(): bit for bit, (genre, _) in enumerate(genres_choices)}
+assert len(GENRE_BITS) <= 24, 'the popcount table has an entry per genre mask'
+
+# ones in each genre mask, indexed by the mask
+POPCOUNT = sum(np.arange(1 << len(GENRE_BITS)) >> bit & 1 for bit in range(len(GENRE_BITS))).astype(np.uint8)
+
+GENRE_WEIGHT = 2
+CITY_WEIGHT = 3
+STATE_WEIGHT = 1
+
+MAX_LIMIT = 50
+# rows dropped or edited in place since the build; past this many the
+# arrays are rebuilt
+MAX_CHANGES = 5000
+
+
+def genre_mask(genres):
+    mask = 0
+    for genre in genres or ():
+        bit = GENRE_BITS.get(genre.lower())
+        if bit is not None:
+            mask |= 1 << bit
+    return mask
+
+def mask_genres(mask):
+    return [genre for genre, _ in genres_choices if mask & (1 << GENRE_BITS[genre.lower()])]
+
+def shared_genres(masks, mask):
+    """Number of genres each of masks shares with mask."""
+    return POPCOUNT[np.bitwise_and(masks, np.uint32(mask))]
+
+
+class Profiles(object):
+    """The seeking profiles of one side, a row per profile.
+
+    Rows are overwritten in place when a profile changes, and emptied
+    when it stops seeking: a row with no genres shares none, so it is
+    never suggested. The arrays grow by doubling.
+    """
+
+    def __init__(self, rows, place):
+        self.place = place
+        self.rows = {}
+        self.size = 0
+        self.inactive = 0
+        self.ids = np.zeros(64, dtype=np.int64)
+        self.masks = np.zeros(64, dtype=np.uint32)
+        self.cities = np.zeros(64, dtype=np.int32)
+        self.states = np.zeros(64, dtype=np.int32)
+        for id, genres, city, state in rows:
+            self.upsert(id, genres, city, state, True)
+
+    def __len__(self):
+        return self.size - self.inactive
+
+    def grow(self):
+        for name in ('ids', 'masks', 'cities', 'states'):
+            values = getattr(self, name)
+            grown = np.zeros(len(values) * 2, dtype=values.dtype)
+            grown[:len(values)] = values
+            setattr(self, name, grown)
+
+    def upsert(self, id, genres, city, state, seeking):
+        row = self.rows.get(id)
+        if not seeking:
+            self.delete(id)
+            return
+        if row is None:
+            if self.size == len(self.ids):
+                self.grow()
+            row = self.rows[id] = self.size
+            self.size += 1
+        self.ids[row] = id
+        self.masks[row] = genre_mask(genres)
+        self.cities[row], self.states[row] = self.place(city, state)
+
+    def delete(self, id):
+        row = self.rows.pop(id, None)
+        if row is not None:
+            self.masks[row] = 0
+            self.inactive += 1
+
+    def best(self, genres, city, state, limit):
+        """(id, score, shared genre mask) of the limit best scoring rows."""
+        mask = genre_mask(genres)
+        size = self.size
+        shared = shared_genres(self.masks[:size], mask)
+        city_code, state_code = self.place(city, state, add=False)
+        scores = shared * np.uint8(GENRE_WEIGHT)
+        scores += (self.cities[:size] == city_code) * np.uint8(CITY_WEIGHT)
+        scores += (self.states[:size] == state_code) * np.uint8(STATE_WEIGHT)
+        scores *= shared > 0
+
+        # scores are small integers: the lowest one taken is the highest
+        # that at least limit rows reach. Of the rows tied at it, those
+        # first in the arrays are taken, which is id order but for the
+        # profiles that started seeking since the build.
+        at_least = np.cumsum(np.bincount(scores)[::-1])[::-1]
+        enough = np.flatnonzero(at_least >= limit)
+        lowest = max(1, int(enough[-1])) if len(enough) else 1
+        rows = np.flatnonzero(scores > lowest)
+        rows = np.concatenate((rows, np.flatnonzero(scores == lowest)[:limit - len(rows)]))
+        rows = rows[np.lexsort((self.ids[rows], -scores[rows].astype(np.int16)))]
+        return [(int(self.ids[row]), int(scores[row]), int(self.masks[row]) & mask) for row in rows]
+
+
+class MatchIndex(object):
+    """The seeking venues and artists, with the city and state codes
+    they share. venues and artists are (id, genres, city, state) rows."""
+
+    def __init__(self, venues, artists):
+        self.cities = {}
+        self.states = {}
+        self.profiles = {VENUE: Profiles(venues, self.place), ARTIST: Profiles(artists, self.place)}
+        self.changes = 0
+
+    def place(self, city, state, add=True):
+        # codes start at 1; a place only looked up gets 0, matching no row
+        state = (state or '').strip().upper()
+        city = (' '.join((city or '').lower().split()), state)
+        if not add:
+            return self.cities.get(city, 0), self.states.get(state, 0)
+        return (self.cities.setdefault(city, len(self.cities) + 1),
+                self.states.setdefault(state, len(self.states) + 1))
+
+    def matches(self, kind, genres, city, state, limit=10):
+        """The best seeking profiles of kind for a profile of the other kind."""
+        return self.profiles[kind].best(genres, city, state, min(limit, MAX_LIMIT))
+
+    def upsert(self, kind, id, genres, city, state, seeking):
+        self.profiles[kind].upsert(id, genres, city, state, seeking)
+        self.changes += 1
+
+    def delete(self, kind, id):
+        self.profiles[kind].delete(id)
+        self.changes += 1
+
+    def apply(self, changes):
+        for change in changes:
+            getattr(self, change[0])(*change[1:])
+
+
+def build_index():
+    queries = []
+    for model, seeking in ((Venue, Venue.seeking_talent), (Artist, Artist.seeking_venue)):
+        queries.append(
+            db.session.query(model.id, model.genres, model.city, model.state)
+            .filter(seeking.is_(True))
+            .order_by(model.id)
+            .yield_per(10000)
+        )
+    return MatchIndex(*queries)
+
+
+class Matchmaker(object):
+    """An app's match index: built on first use, then rebuilt in a
+    background thread once it is older than MATCHING_MAX_AGE or has
+    collected too many changes. Changes committed during a rebuild are
+    applied again to the new index."""
+
+    def __init__(self, app):
+        self.app = app
+        self.index = None
+        self.built_at = 0
+        self.rebuilding = None
+        self.lock = threading.Lock()
+
+    def get_index(self):
+        if self.index is None:
+            with self.lock:
+                if self.index is None:
+                    self.index = build_index()
+                    self.built_at = time.time()
+        elif self.rebuilding is None and (time.time() - self.built_at > self.app.config.get('MATCHING_MAX_AGE', 300)
+                                          or self.index.changes > MAX_CHANGES):
+            with self.lock:
+                if self.rebuilding is None:
+                    self.rebuilding = []
+                    threading.Thread(target=self.rebuild, name='matching-rebuild', daemon=True).start()
+        return self.index
+
+    def rebuild(self):
+        try:
+            with self.app.app_context():
+                index = build_index()
+            with self.lock:
+                index.apply(self.rebuilding)
+                self.index = index
+                self.built_at = time.time()
+        finally:
+            self.rebuilding = None
+
+    def apply(self, changes):
+        with self.lock:
+            if self.index is not None:
+                self.index.apply(changes)
+            if self.rebuilding is not None:
+                self.rebuilding.extend(changes)
+
+    def invalidate(self):
+        # rebuilt on the next lookup
+        self.built_at = 0
+
+    def matches(self, kind, genres, city, state, limit=10):
+        index = self.get_index()
+        with self.lock:
+            return index.matches(kind, genres, city, state, limit)
+
+
+def init_app(app):
+    app.extensions['matching'] = Matchmaker(app)
+
+def suggested_artists(venue, limit=10):
+    """Artists seeking a venue, best matches for venue first."""
+    return current_app.extensions['matching'].matches(ARTIST, venue.genres, venue.city, venue.state, limit)
+
+def suggested_venues(artist, limit=10):
+    """Venues seeking talent, best matches for artist first."""
+    return current_app.extensions['matching'].matches(VENUE, artist.genres, artist.city, artist.state, limit)
+
+
+#----------------------------------------------------------------------------#
+# Change tracking.
+#
+# As in autocomplete.py: profile writes are collected on the session and
+# applied once they commit.
+#----------------------------------------------------------------------------#
+
+PROFILE_FIELDS = {Venue: 'seeking_talent', Artist: 'seeking_venue'}
+
+def record(target, change):
+    db.inspect(target).session.info.setdefault('matching', []).append(change)
+
+def kind_of(target):
+    return VENUE if isinstance(target, Venue) else ARTIST
+
+def record_inserted_profile(mapper, connection, target):
+    seeking = bool(getattr(target, PROFILE_FIELDS[type(target)]))
+    # a single genre may be assigned as a string (see GenreList)
+    genres = [target.genres] if isinstance(target.genres, str) else list(target.genres or ())
+    record(target, ('upsert', kind_of(target), target.id, genres, target.city, target.state, seeking))
+
+def record_updated_profile(mapper, connection, target):
+    state = db.inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('genres', 'city', 'state', PROFILE_FIELDS[type(target)])):
+        record_inserted_profile(mapper, connection, target)
+
+def record_deleted_profile(mapper, connection, target):
+    record(target, ('delete', kind_of(target), target.id))
+
+for model in PROFILE_FIELDS:
+    event.listen(model, 'after_insert', record_inserted_profile)
+    event.listen(model, 'after_update', record_updated_profile)
+    event.listen(model, 'after_delete', record_deleted_profile)
+
+@event.listens_for(db.session, 'after_commit')
+def apply_committed(session):
+    changes = session.info.pop('matching', None)
+    if changes and has_app_context() and 'matching' in current_app.extensions:
+        # as in autocomplete.py, a failure here is logged and rebuilt from,
+        # never raised into the code that committed
+        matchmaker = current_app.extensions['matching']
+        try:
+            matchmaker.apply(changes)
+        except Exception:
+            current_app.logger.exception('matching: could not apply %d committed changes', len(changes))
+            matchmaker.invalidate()
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_uncommitted(session):
+    session.info.pop('matching', None)
@@ -0,0 +1,32 @@
+"""range indexes on Show (venue_id, start_time) and (artist_id, start_time)
+
+Revision ID: 053b6110726f
+Revises: f0861c4a2b8a
+Create Date: 2026-10-18 12:14:09.872340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '053b6110726f'
+down_revision = 'f0861c4a2b8a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the composite indexes lead with the foreign keys, so they replace
+    # the single column ones for joins as well as for time range scans
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.drop_index('ix_Show_venue_id', table_name='Show')
+    op.drop_index('ix_Show_artist_id', table_name='Show')
+
+
+def downgrade():
+    op.create_index('ix_Show_artist_id', 'Show', ['artist_id'], unique=False)
+    op.create_index('ix_Show_venue_id', 'Show', ['venue_id'], unique=False)
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
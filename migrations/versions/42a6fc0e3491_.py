@@ -0,0 +1,35 @@
+"""TableVersion rows for conditional listing pages
+
+Revision ID: 42a6fc0e3491
+Revises: 8b54297d53a8
+Create Date: 2026-10-18 20:04:12.518337
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '42a6fc0e3491'
+down_revision = '8b54297d53a8'
+branch_labels = None
+depends_on = None
+
+TABLES = ['Venue', 'Artist', 'Show', 'VenueStats', 'ArtistStats']
+
+
+def upgrade():
+    table_version = op.create_table('TableVersion',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    now = datetime.utcnow()
+    op.bulk_insert(table_version, [{'name': name, 'version': 0, 'updated_at': now} for name in TABLES])
+
+
+def downgrade():
+    op.drop_table('TableVersion')
@@ -0,0 +1,32 @@
+"""index show foreign keys and listing sort keys
+
+Revision ID: 7a313d2af0ef
+Revises: e2f657b7b393
+Create Date: 2026-10-18 10:03:27.540871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a313d2af0ef'
+down_revision = 'e2f657b7b393'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_Show_venue_id'), 'Show', ['venue_id'], unique=False)
+    op.create_index(op.f('ix_Show_artist_id'), 'Show', ['artist_id'], unique=False)
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+    op.create_index('ix_Artist_name_id', 'Artist', ['name', 'id'], unique=False)
+    op.create_index('ix_Venue_city_state_name_id', 'Venue', ['city', 'state', 'name', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_city_state_name_id', table_name='Venue')
+    op.drop_index('ix_Artist_name_id', table_name='Artist')
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
+    op.drop_index(op.f('ix_Show_artist_id'), table_name='Show')
+    op.drop_index(op.f('ix_Show_venue_id'), table_name='Show')
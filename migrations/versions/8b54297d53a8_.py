@@ -0,0 +1,102 @@
+"""range partition Show by start_time
+
+Revision ID: 8b54297d53a8
+Revises: df522fa4dedf
+Create Date: 2026-10-18 15:20:37.604418
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b54297d53a8'
+down_revision = 'df522fa4dedf'
+branch_labels = None
+depends_on = None
+
+# quarters, from the first show's to a year ahead; `flask partitions
+# maintain` (partitions.py) keeps creating them from there
+PARTITION_MONTHS = 3
+AHEAD_MONTHS = 12
+
+INDEXES = [
+    ('ix_Show_start_time_id', ['start_time', 'id']),
+    ('ix_Show_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_Show_artist_id_start_time', ['artist_id', 'start_time']),
+]
+
+
+def month_index(moment):
+    return moment.year * 12 + moment.month - 1
+
+def month_start(index):
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def upgrade():
+    connection = op.get_bind()
+    first = connection.execute(sa.text('SELECT min(start_time) FROM "Show"')).scalar() or datetime.utcnow()
+
+    op.execute('ALTER TABLE "Show" RENAME TO "Show_unpartitioned"')
+    op.execute('ALTER INDEX "Show_pkey" RENAME TO "Show_unpartitioned_pkey"')
+    for name, _ in INDEXES:
+        op.execute('ALTER INDEX "%s" RENAME TO "%s"' % (name, name.replace('Show', 'Show_unpartitioned', 1)))
+    # the id sequence outlives the old table
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY NONE')
+
+    # a partitioned table's primary key must hold its partition key
+    op.execute(
+        'CREATE TABLE "Show" ('
+        'id INTEGER NOT NULL DEFAULT nextval(\'"Show_id_seq"\'::regclass), '
+        'venue_id INTEGER NOT NULL REFERENCES "Venue" (id), '
+        'artist_id INTEGER NOT NULL REFERENCES "Artist" (id), '
+        'start_time TIMESTAMP WITHOUT TIME ZONE NOT NULL, '
+        'CONSTRAINT "Show_pkey" PRIMARY KEY (id, start_time)'
+        ') PARTITION BY RANGE (start_time)'
+    )
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY "Show".id')
+    for name, columns in INDEXES:
+        op.create_index(name, 'Show', columns, unique=False)
+
+    start = month_index(first) // PARTITION_MONTHS * PARTITION_MONTHS
+    end = month_index(datetime.utcnow()) + AHEAD_MONTHS
+    while start < end:
+        op.execute('CREATE TABLE "Show_%s" PARTITION OF "Show" FOR VALUES FROM (\'%s\') TO (\'%s\')' % (
+            month_start(start).strftime('%Y_%m'), month_start(start), month_start(start + PARTITION_MONTHS)))
+        start += PARTITION_MONTHS
+    # shows beyond the last partition, until maintenance moves them out
+    op.execute('CREATE TABLE "Show_default" PARTITION OF "Show" DEFAULT')
+
+    op.execute('INSERT INTO "Show" (id, venue_id, artist_id, start_time) '
+               'SELECT id, venue_id, artist_id, start_time FROM "Show_unpartitioned"')
+    op.drop_table('Show_unpartitioned')
+    op.execute('ANALYZE "Show"')
+
+
+def downgrade():
+    # shows in archived partitions (see partitions.py) are not brought back
+    op.execute('ALTER TABLE "Show" RENAME TO "Show_partitioned"')
+    op.execute('ALTER INDEX "Show_pkey" RENAME TO "Show_partitioned_pkey"')
+    for name, _ in INDEXES:
+        op.execute('ALTER INDEX "%s" RENAME TO "%s"' % (name, name.replace('Show', 'Show_partitioned', 1)))
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY NONE')
+
+    op.create_table('Show',
+    sa.Column('id', sa.Integer(), server_default=sa.text('nextval(\'"Show_id_seq"\'::regclass)'), nullable=False),
+    sa.Column('venue_id', sa.Integer(), nullable=False),
+    sa.Column('artist_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], ),
+    sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('ALTER SEQUENCE "Show_id_seq" OWNED BY "Show".id')
+    op.execute('INSERT INTO "Show" (id, venue_id, artist_id, start_time) '
+               'SELECT id, venue_id, artist_id, start_time FROM "Show_partitioned"')
+    for name, columns in INDEXES:
+        op.create_index(name, 'Show', columns, unique=False)
+    # drops the partitions with it
+    op.drop_table('Show_partitioned')
@@ -0,0 +1,42 @@
+"""store genres as text arrays with GIN indexes
+
+Revision ID: 9b634c7bdf31
+Revises: 7a313d2af0ef
+Create Date: 2026-10-18 10:41:05.226913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b634c7bdf31'
+down_revision = '7a313d2af0ef'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.drop_index('ix_%s_genres_trgm' % table, table_name=table)
+        # populate_obj wrote the form's list through psycopg2, which left
+        # array literals such as '{Jazz,"Rock n Roll"}'; hand-entered rows
+        # are comma separated names, maybe with spaces around the commas
+        # (USING allows no subquery, so the names are trimmed by the split)
+        op.execute(
+            'ALTER TABLE "%s" ALTER COLUMN genres TYPE text[] USING '
+            "CASE WHEN genres LIKE '{%%}' THEN genres::text[] "
+            "ELSE array_remove(regexp_split_to_array(trim(genres), '\\s*,\\s*'), '') END" % table
+        )
+        op.create_index('ix_%s_genres' % table, table, ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.drop_index('ix_%s_genres' % table, table_name=table)
+        op.execute(
+            'ALTER TABLE "%s" ALTER COLUMN genres TYPE varchar(120) USING '
+            "array_to_string(genres, ',')" % table
+        )
+        op.create_index('ix_%s_genres_trgm' % table, table, ['genres'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'genres': 'gin_trgm_ops'})
@@ -0,0 +1,44 @@
+"""VenueStats and ArtistStats show counts
+
+Revision ID: df522fa4dedf
+Revises: 053b6110726f
+Create Date: 2026-10-18 13:02:41.118205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'df522fa4dedf'
+down_revision = '053b6110726f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table, parent, key in (('VenueStats', 'Venue', 'venue_id'), ('ArtistStats', 'Artist', 'artist_id')):
+        op.create_table(table,
+        sa.Column(key, sa.Integer(), nullable=False),
+        sa.Column('upcoming_shows_count', sa.Integer(), nullable=False),
+        sa.Column('past_shows_count', sa.Integer(), nullable=False),
+        sa.Column('next_show_at', sa.DateTime(), nullable=True),
+        sa.Column('counted_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint([key], ['%s.id' % parent], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(key)
+        )
+        op.create_index(op.f('ix_%s_next_show_at' % table), table, ['next_show_at'], unique=False)
+        # same as `flask stats rebuild`
+        op.execute(
+            'INSERT INTO "{table}" ({key}, upcoming_shows_count, past_shows_count, next_show_at, counted_at, updated_at) '
+            'SELECT p.id, count(s.id) FILTER (WHERE s.start_time > now()), count(s.id) FILTER (WHERE s.start_time <= now()), '
+            'min(s.start_time) FILTER (WHERE s.start_time > now()), now(), now() at time zone \'utc\' '
+            'FROM "{parent}" p LEFT JOIN "Show" s ON s.{key} = p.id GROUP BY p.id'.format(table=table, parent=parent, key=key)
+        )
+
+
+def downgrade():
+    for table in ('ArtistStats', 'VenueStats'):
+        op.drop_index(op.f('ix_%s_next_show_at' % table), table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,30 @@
+"""add pg_trgm indexes for venue and artist search
+
+Revision ID: e2f657b7b393
+Revises: 01fabb18491d
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f657b7b393'
+down_revision = '01fabb18491d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        for column in ('name', 'city', 'genres'):
+            op.create_index('ix_%s_%s_trgm' % (table, column), table, [column], unique=False,
+                            postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        for column in ('name', 'city', 'genres'):
+            op.drop_index('ix_%s_%s_trgm' % (table, column), table_name=table)
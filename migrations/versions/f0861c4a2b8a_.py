@@ -0,0 +1,28 @@
+"""add updated_at versions to Venue and Artist
+
+Revision ID: f0861c4a2b8a
+Revises: 9b634c7bdf31
+Create Date: 2026-10-18 11:26:52.604318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0861c4a2b8a'
+down_revision = '9b634c7bdf31'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text("(now() at time zone 'utc')")))
+        op.alter_column(table, 'updated_at', server_default=None)
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.drop_column(table, 'updated_at')
@@ -2,24 +2,74 @@
 # Imports
 #----------------------------------------------------------------------------#
 
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+from datetime import datetime
+from itertools import chain
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+
+from routing import RoutingSQLAlchemy, stick_to_primary
 
 #----------------------------------------------------------------------------#
-# App Config.
+# Database.
 #----------------------------------------------------------------------------#
 
-app = Flask(__name__)
-db = SQLAlchemy()
-migrate = Migrate(app, db)
+# bound to the application in create_app() (app.py)
+db = RoutingSQLAlchemy()
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+class GenreList(db.TypeDecorator):
+    """A list of genre names.
+
+    Stored as a text[] array on PostgreSQL, where a GIN index serves
+    containment filters, and as a comma separated string elsewhere.
+    """
+    impl = db.Text
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.ARRAY(db.Text))
+        return dialect.type_descriptor(db.Text())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = [value]
+        if dialect.name == 'postgresql':
+            return list(value)
+        return ','.join(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return []
+        if dialect.name == 'postgresql':
+            return list(value)
+        return value.split(',') if value else []
+
+def has_genre(model, genre):
+    if db.engine.dialect.name == 'postgresql':
+        return model.genres.op('@>')([genre])
+    # the genre between commas, found by position rather than LIKE so no
+    # character of it is a wildcard, and case-sensitive like @>
+    return db.func.instr(',' + db.type_coerce(model.genres, db.Text) + ',', ',' + genre + ',') > 0
+
+def trigram_index(table, column):
+    # GIN trigram indexes back the ILIKE filters in search.py on PostgreSQL
+    return db.Index('ix_%s_%s_trgm' % (table, column), column, postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        trigram_index('Venue', 'name'),
+        trigram_index('Venue', 'city'),
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_Venue_city_state_name_id', 'city', 'state', 'name', 'id'),
+    )
 
     id                  = db.Column(db.Integer, primary_key=True)
     name                = db.Column(db.String, nullable=False)
@@ -29,11 +79,14 @@ class Venue(db.Model):
     phone               = db.Column(db.String(120))
     image_link          = db.Column(db.String(500))
     facebook_link       = db.Column(db.String(120))
-    genres              = db.Column(db.String(120), nullable=False)
+    genres              = db.Column(GenreList, nullable=False)
     website             = db.Column(db.String(120))
     seeking_talent      = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    Show = db.relationship('Show', backref='venue', lazy=True)
+    updated_at          = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # passive_deletes: deleting a venue leaves its shows to the foreign key
+    # instead of loading them, which raise mode (loading.py) would refuse
+    Show = db.relationship('Show', backref='venue', lazy=True, passive_deletes=True)
     pass
     # def __init__(self, name, city, state, address, phone, image_link, facebook_link, genres, website, seeking_talent, seeking_description):
     #     self.name                = name
@@ -55,27 +108,260 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        trigram_index('Artist', 'name'),
+        trigram_index('Artist', 'city'),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+    )
 
     id                  = db.Column(db.Integer, primary_key=True)
     name                = db.Column(db.String, nullable=False)
     city                = db.Column(db.String(120), nullable=False)
     state               = db.Column(db.String(120), nullable=False)
     phone               = db.Column(db.String(120))
-    genres              = db.Column(db.String(120), nullable=False)
+    genres              = db.Column(GenreList, nullable=False)
     image_link          = db.Column(db.String(500))
     website             = db.Column(db.String(120))
     facebook_link       = db.Column(db.String(120))
     seeking_venue       = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(500))
-    Show = db.relationship('Show', backref='artist', lazy=True)
+    updated_at          = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    Show = db.relationship('Show', backref='artist', lazy=True, passive_deletes=True)
     pass
     # implement any missing fields, as a database migration using Flask-Migrate
 
 class Show(db.Model):
+    # on PostgreSQL the table is range partitioned by start_time, with a
+    # primary key of (id, start_time) (see partitions.py); ids still come
+    # from the one sequence
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
-    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
-    start_time = db.Column(db.DateTime, nullable=False)
-    pass
\ No newline at end of file
+    # active history keeps the old values of a changed show, which the
+    # show statistics below subtract
+    venue_id = db.column_property(db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False), active_history=True)
+    artist_id = db.column_property(db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False), active_history=True)
+    start_time = db.column_property(db.Column(db.DateTime, nullable=False), active_history=True)
+    pass
+
+def previous_value(target, name):
+    history = db.inspect(target).attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(target, name)
+
+def touch_show_parents(mapper, connection, target):
+    # a show changes both detail pages, so it bumps the version (and the
+    # ETag) of its venue and its artist, and of those it was moved from
+    now = datetime.utcnow()
+    for model, key in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+        ids = {int(getattr(target, key)), int(previous_value(target, key))}
+        connection.execute(model.__table__.update().where(model.id.in_(ids)).values(updated_at=now))
+
+for event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Show, event_name, touch_show_parents)
+
+#----------------------------------------------------------------------------#
+# Show statistics.
+#
+# Per venue and per artist show counts, so listings do not count shows on
+# every render. Shows are split into upcoming and past at counted_at: a
+# show write adjusts its venue's and artist's row in the same transaction,
+# and `flask stats roll` (stats.py), run periodically, moves the shows
+# that have started since into past and advances counted_at. A venue or
+# artist gets its row with its first show; `flask stats rebuild` computes
+# all rows from the Show table.
+#----------------------------------------------------------------------------#
+
+class ShowStatsMixin(object):
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0)
+    past_shows_count     = db.Column(db.Integer, nullable=False, default=0)
+    next_show_at         = db.Column(db.DateTime, index=True)
+    counted_at           = db.Column(db.DateTime, nullable=False)
+    updated_at           = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def shows_count(self):
+        return self.upcoming_shows_count + self.past_shows_count
+
+class VenueStats(ShowStatsMixin, db.Model):
+    __tablename__ = 'VenueStats'
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True)
+
+class ArtistStats(ShowStatsMixin, db.Model):
+    __tablename__ = 'ArtistStats'
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True)
+
+# stats model -> (counted model, key column shared by the stats and Show)
+SHOW_STATS = {
+    VenueStats: (Venue, 'venue_id'),
+    ArtistStats: (Artist, 'artist_id'),
+}
+
+def next_show_select(stats, after):
+    table = stats.__table__
+    show_key = Show.__table__.c[SHOW_STATS[stats][1]]
+    return db.select([db.func.min(Show.start_time)]) \
+        .where(db.and_(show_key==table.c[SHOW_STATS[stats][1]], Show.start_time > after)).as_scalar()
+
+def show_stats_select(stats, ids=None):
+    """Stats rows computed from scratch, for the given ids or all of them."""
+    model, key = SHOW_STATS[stats]
+    show_key = Show.__table__.c[key]
+    now = db.func.now()
+    upcoming = Show.start_time > now
+    # the outer join leaves a venue or artist without shows one null row
+    upcoming_count = db.func.coalesce(db.func.sum(db.case([(upcoming, 1)], else_=0)), 0)
+    query = db.select([
+        model.id,
+        upcoming_count,
+        db.func.count(Show.id) - upcoming_count,
+        db.func.min(db.case([(upcoming, Show.start_time)])),
+        now,
+        db.literal(datetime.utcnow(), db.DateTime),
+    ]).select_from(model.__table__.outerjoin(Show.__table__, show_key==model.id)).group_by(model.id)
+    if ids is not None:
+        query = query.where(model.id.in_(ids))
+    return query
+
+def insert_show_stats(connection, stats, ids=None):
+    table = stats.__table__
+    columns = [SHOW_STATS[stats][1], 'upcoming_shows_count', 'past_shows_count', 'next_show_at', 'counted_at', 'updated_at']
+    connection.execute(table.insert().from_select(columns, show_stats_select(stats, ids)))
+
+def insert_missing(connection, table, rows):
+    """Insert rows, skipping those whose primary key is already taken."""
+    if connection.dialect.name == 'postgresql':
+        connection.execute(postgresql.insert(table).on_conflict_do_nothing(), rows)
+    else:
+        connection.execute(table.insert().prefix_with('OR IGNORE'), rows)
+
+def count_show(connection, stats, key_value, start_time, delta):
+    table = stats.__table__
+    key = SHOW_STATS[stats][1]
+    upcoming = table.c.counted_at < start_time
+    update = table.update().where(table.c[key]==key_value).values(
+        upcoming_shows_count=table.c.upcoming_shows_count + db.case([(upcoming, delta)], else_=0),
+        past_shows_count=table.c.past_shows_count + db.case([(upcoming, 0)], else_=delta),
+        next_show_at=next_show_select(stats, table.c.counted_at),
+    )
+    if connection.execute(update).rowcount == 0:
+        # a venue or artist without a row has had no shows so far; another
+        # transaction may be adding the row too, so a taken key is skipped
+        # (once that transaction ends) and the update applied to its row
+        insert_missing(connection, table, [{
+            key: key_value, 'upcoming_shows_count': 0, 'past_shows_count': 0,
+            'counted_at': connection.scalar(db.select([db.func.now()])),
+        }])
+        connection.execute(update)
+
+def count_inserted_show(mapper, connection, target):
+    for stats, (_, key) in SHOW_STATS.items():
+        count_show(connection, stats, getattr(target, key), target.start_time, 1)
+
+def count_deleted_show(mapper, connection, target):
+    for stats, (_, key) in SHOW_STATS.items():
+        count_show(connection, stats, previous_value(target, key), previous_value(target, 'start_time'), -1)
+
+def count_updated_show(mapper, connection, target):
+    state = db.inspect(target)
+    for stats, (_, key) in SHOW_STATS.items():
+        if state.attrs[key].history.has_changes() or state.attrs.start_time.history.has_changes():
+            count_show(connection, stats, previous_value(target, key), previous_value(target, 'start_time'), -1)
+            count_show(connection, stats, getattr(target, key), target.start_time, 1)
+
+event.listen(Show, 'after_insert', count_inserted_show)
+event.listen(Show, 'after_update', count_updated_show)
+event.listen(Show, 'after_delete', count_deleted_show)
+
+#----------------------------------------------------------------------------#
+# Change notifications.
+#----------------------------------------------------------------------------#
+
+# Callables registered here are called with the set of model classes
+# (Venue, Artist, Show) written by a transaction, once it has committed.
+committed_listeners = []
+
+def on_models_committed(listener):
+    # extensions register from init_app, which runs once per created app
+    if listener not in committed_listeners:
+        committed_listeners.append(listener)
+    return listener
+
+def record_changes(session, models):
+    session.info.setdefault('changed_models', set()).update(models)
+
+@event.listens_for(db.session, 'after_flush')
+def record_flushed_models(session, flush_context):
+    record_changes(session, {
+        type(instance) for instance in chain(session.new, session.dirty, session.deleted)
+        if isinstance(instance, (Venue, Artist, Show))
+    })
+
+@event.listens_for(db.session, 'after_bulk_update')
+@event.listens_for(db.session, 'after_bulk_delete')
+def record_bulk_models(context):
+    record_changes(context.session, {context.mapper.class_})
+
+@event.listens_for(db.session, 'after_commit')
+def notify_committed_models(session):
+    models = session.info.pop('changed_models', None)
+    if models:
+        for listener in committed_listeners:
+            listener(models)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_changed_models(session):
+    session.info.pop('changed_models', None)
+
+# a client that just wrote reads from the primary until replicas catch up
+on_models_committed(stick_to_primary)
+
+#----------------------------------------------------------------------------#
+# Table versions.
+#
+# A row per table whose version goes up after every committed write to
+# the table, so a listing page (conditional.py) learns whether it changed
+# from a few primary key lookups instead of aggregating the tables. Show
+# writes change the show counts too, so they bump the stats tables.
+# The bump is its own short transaction after the commit, which keeps the
+# row from being a lock every writer waits on.
+#----------------------------------------------------------------------------#
+
+class TableVersion(db.Model):
+    __tablename__ = 'TableVersion'
+    name       = db.Column(db.String(64), primary_key=True)
+    version    = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+# model -> the other tables a write to it changes
+VERSION_DEPENDENTS = {Show: (VenueStats, ArtistStats)}
+
+def bump_versions(connection, names):
+    table = TableVersion.__table__
+    now = datetime.utcnow()
+    update = table.update().where(table.c.name.in_(names)).values(version=table.c.version + 1, updated_at=now)
+    if connection.execute(update).rowcount < len(names):
+        # tables created by create_all() rather than the migrations
+        insert_missing(connection, table, [{'name': name, 'version': 0, 'updated_at': now} for name in names])
+        connection.execute(update)
+
+@on_models_committed
+def bump_table_versions(models):
+    names = sorted({model.__tablename__ for model in models}
+                   | {other.__tablename__ for model in models for other in VERSION_DEPENDENTS.get(model, ())})
+    if not has_app_context():
+        return
+    # the write has committed: failing here must not fail the code that
+    # committed it, and the next write bumps the versions again
+    try:
+        with db.engine.begin() as connection:
+            bump_versions(connection, names)
+    except Exception:
+        current_app.logger.exception('could not bump the table versions of %s', ', '.join(names))
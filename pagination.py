@@ -0,0 +1,75 @@
+#----------------------------------------------------------------------------#
+# Keyset (cursor) pagination.
+#
+# Pages are addressed by the sort key of the last (or first) row seen, so
+# the database seeks straight to the page through the index instead of
+# skipping OFFSET rows. Deep pages cost the same as the first one.
+#----------------------------------------------------------------------------#
+
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from flask import abort
+
+from models import db
+
+PER_PAGE = 30
+
+Page = namedtuple('Page', ['items', 'prev_cursor', 'next_cursor'])
+
+
+def encode_cursor(row, keys):
+    values = []
+    for key in keys:
+        value = getattr(row, key.key)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_value(key, value):
+    # a cursor comes from the client: each value must be a scalar of its
+    # sort column's type, or binding it fails after the filter is built
+    if isinstance(key.type, db.DateTime):
+        if not isinstance(value, str):
+            raise ValueError('%s must be an ISO datetime' % key.key)
+        return datetime.fromisoformat(value)
+    if isinstance(key.type, db.Integer):
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError('%s must be an integer' % key.key)
+        return value
+    if not isinstance(value, str):
+        raise ValueError('%s must be a string' % key.key)
+    return value
+
+def decode_cursor(cursor, keys):
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError('cursor does not match the page keys')
+    return [decode_value(key, value) for key, value in zip(keys, values)]
+
+def keyset_paginate(query, keys, after=None, before=None, per_page=PER_PAGE):
+    # keys must be unique together (end with the primary key) and be
+    # selected by the query under their attribute names
+    key = db.tuple_(*keys)
+    try:
+        if before:
+            query = query.filter(key < db.tuple_(*decode_cursor(before, keys)))
+        elif after:
+            query = query.filter(key > db.tuple_(*decode_cursor(after, keys)))
+    except (ValueError, TypeError):
+        abort(400)
+
+    if before:
+        rows = query.order_by(*[column.desc() for column in keys]).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        prev_cursor = encode_cursor(rows[0], keys) if has_more else None
+        next_cursor = encode_cursor(rows[-1], keys) if rows else None
+    else:
+        rows = query.order_by(*keys).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        prev_cursor = encode_cursor(rows[0], keys) if after and rows else None
+        next_cursor = encode_cursor(rows[-1], keys) if has_more else None
+    return Page(rows, prev_cursor, next_cursor)
@@ -0,0 +1,203 @@
+#----------------------------------------------------------------------------#
+# Show partition maintenance.
+#
+#   flask partitions list
+#   flask partitions maintain    run daily or so, e.g. from cron
+#
+# On PostgreSQL the Show table is range partitioned by start_time (see
+# migration 8b54297d53a8): queries filtering on start_time, as the
+# upcoming show ones do, only scan the partitions their range can reach.
+# A DEFAULT partition takes the shows no partition covers.
+#
+# maintain creates the partitions SHOW_PARTITIONS_AHEAD_MONTHS ahead,
+# SHOW_PARTITION_MONTHS long, and those that shows landing in the default
+# partition (imported history, far future bookings) belong in, moving
+# them out of it. With SHOW_ARCHIVE_AFTER_MONTHS set it also detaches
+# the partitions that ended longer ago than that into the archive schema
+# (or drops them with --drop). Archived shows leave the venue and artist
+# pages and their past show counts.
+#----------------------------------------------------------------------------#
+
+import re
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from models import db, Venue, Artist, Show, VenueStats, ArtistStats
+from stats import rebuild_stats
+
+partitions_cli = AppGroup('partitions', help='Create and archive the Show table partitions.')
+
+PARENT = 'Show'
+DEFAULT = 'Show_default'
+ARCHIVE_SCHEMA = 'archive'
+
+BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def month_index(moment):
+    return moment.year * 12 + moment.month - 1
+
+def month_start(index):
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def partition_name(start):
+    return '%s_%s' % (PARENT, start.strftime('%Y_%m'))
+
+def quote(name):
+    return '"%s"' % name
+
+def is_partitioned():
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)", {'name': quote(PARENT)}
+    ).scalar() == 'p'
+
+def partitions():
+    """(name, start, end) of the Show partitions in order, the default one left out."""
+    rows = db.session.execute(
+        'SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) '
+        'FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE pg_inherits.inhparent = to_regclass(:name)', {'name': quote(PARENT)}
+    )
+    found = []
+    for name, bounds in rows:
+        match = BOUNDS.search(bounds)
+        if match:
+            found.append((name, datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))))
+    return sorted(found, key=lambda partition: partition[1])
+
+
+def missing_ranges(lower, upper, existing):
+    # the parts of [lower, upper) no partition in existing covers
+    for name, start, end in existing:
+        if start >= upper:
+            break
+        if end > lower:
+            if start > lower:
+                yield lower, start
+            lower = end
+    if lower < upper:
+        yield lower, upper
+
+def add_partition(lower, upper):
+    """Create the partition for [lower, upper).
+
+    The range of a new partition must be empty in the default partition,
+    so any shows it holds there are moved into the new table before it
+    is attached.
+    """
+    name = quote(partition_name(lower))
+    bounds = "FOR VALUES FROM ('%s') TO ('%s')" % (lower, upper)
+    in_range = {'lower': lower, 'upper': upper}
+    stray = db.session.execute(
+        'SELECT 1 FROM %s WHERE start_time >= :lower AND start_time < :upper LIMIT 1' % quote(DEFAULT), in_range
+    ).first()
+    if stray is None:
+        db.session.execute('CREATE TABLE %s PARTITION OF %s %s' % (name, quote(PARENT), bounds))
+    else:
+        db.session.execute('CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS INCLUDING CONSTRAINTS)' % (name, quote(PARENT)))
+        db.session.execute(
+            'WITH moved AS (DELETE FROM %s WHERE start_time >= :lower AND start_time < :upper RETURNING *) '
+            'INSERT INTO %s SELECT * FROM moved' % (quote(DEFAULT), name), in_range)
+        db.session.execute('ALTER TABLE %s ATTACH PARTITION %s %s' % (quote(PARENT), name, bounds))
+    return partition_name(lower)
+
+def create_partitions(until, months):
+    """Create the partitions from the current period up to until, and
+    those of the periods the shows in the default partition fall in.
+
+    Periods are months long, aligned on the year; where an existing
+    partition covers part of one, only the rest is created. Returns the
+    names created.
+    """
+    first = month_index(datetime.utcnow()) // months * months
+    periods = set(range(first, month_index(until), months))
+    strays = db.session.execute(
+        'SELECT DISTINCT (extract(year FROM start_time) * 12 + extract(month FROM start_time) - 1)::integer FROM %s'
+        % quote(DEFAULT))
+    periods.update(index // months * months for index, in strays)
+
+    existing = partitions()
+    created = []
+    for period in sorted(periods):
+        for lower, upper in list(missing_ranges(month_start(period), month_start(period + months), existing)):
+            created.append(add_partition(lower, upper))
+            existing = sorted(existing + [(created[-1], lower, upper)], key=lambda partition: partition[1])
+    return created
+
+def archive_partitions(before, drop=False):
+    """Detach the partitions ending on or before `before`.
+
+    A detached partition keeps its rows but not its foreign keys, so it
+    does not hold back venue or artist deletes; it is moved to the
+    archive schema, or dropped. The venues and artists that had shows in
+    it get a new version and their stats rebuilt. Returns the names
+    archived.
+    """
+    old = [(name, end) for name, start, end in partitions() if end <= before]
+    if not old:
+        return []
+    shows = db.session.query(Show.venue_id, Show.artist_id).filter(Show.start_time < max(end for name, end in old))
+    venue_ids = [venue_id for venue_id, in shows.with_entities(Show.venue_id).distinct()]
+    artist_ids = [artist_id for artist_id, in shows.with_entities(Show.artist_id).distinct()]
+
+    if not drop:
+        db.session.execute('CREATE SCHEMA IF NOT EXISTS %s' % ARCHIVE_SCHEMA)
+    for name, end in old:
+        db.session.execute('ALTER TABLE %s DETACH PARTITION %s' % (quote(PARENT), quote(name)))
+        if drop:
+            db.session.execute('DROP TABLE %s' % quote(name))
+            continue
+        foreign_keys = db.session.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(:name) AND contype = 'f'",
+            {'name': quote(name)}
+        )
+        for constraint, in list(foreign_keys):
+            db.session.execute('ALTER TABLE %s DROP CONSTRAINT %s' % (quote(name), quote(constraint)))
+        db.session.execute('ALTER TABLE %s SET SCHEMA %s' % (quote(name), ARCHIVE_SCHEMA))
+
+    now = datetime.utcnow()
+    db.session.query(Venue).filter(Venue.id.in_(venue_ids)).update({Venue.updated_at: now}, synchronize_session=False)
+    db.session.query(Artist).filter(Artist.id.in_(artist_ids)).update({Artist.updated_at: now}, synchronize_session=False)
+    rebuild_stats({VenueStats: venue_ids, ArtistStats: artist_ids})
+    return [name for name, end in old]
+
+
+@partitions_cli.command('list')
+def list_command():
+    """Show each partition's range and row count."""
+    if not is_partitioned():
+        raise click.ClickException('the Show table is not partitioned; run `flask db upgrade` on PostgreSQL')
+    for name, start, end in partitions() + [(DEFAULT, None, None)]:
+        count = db.session.execute('SELECT count(*) FROM %s' % quote(name)).scalar()
+        bounds = '%s to %s' % (start.date(), end.date()) if start else 'default'
+        click.echo('%-20s %-26s %10d shows' % (name, bounds, count))
+
+@partitions_cli.command('maintain')
+@click.option('--ahead', type=int, help='Months of partitions to keep ahead; defaults to SHOW_PARTITIONS_AHEAD_MONTHS.')
+@click.option('--archive-after', type=int,
+              help='Archive the partitions that ended this many months ago; defaults to SHOW_ARCHIVE_AFTER_MONTHS.')
+@click.option('--drop', is_flag=True, help='Drop the old partitions instead of moving them to the archive schema.')
+def maintain_command(ahead, archive_after, drop):
+    """Create upcoming Show partitions and archive old ones."""
+    if not is_partitioned():
+        raise click.ClickException('the Show table is not partitioned; run `flask db upgrade` on PostgreSQL')
+    config = current_app.config
+    started = time.time()
+    this_month = month_index(datetime.utcnow())
+    if ahead is None:
+        ahead = config.get('SHOW_PARTITIONS_AHEAD_MONTHS', 12)
+    if archive_after is None:
+        archive_after = config.get('SHOW_ARCHIVE_AFTER_MONTHS')
+    created = create_partitions(month_start(this_month + ahead), config.get('SHOW_PARTITION_MONTHS', 3))
+    archived = []
+    if archive_after is not None:
+        archived = archive_partitions(month_start(this_month - archive_after), drop)
+    db.session.commit()
+    click.echo('partitions: %d created, %d %s in %.1fs' % (
+        len(created), len(archived), 'dropped' if drop else 'archived', time.time() - started), err=True)
@@ -0,0 +1,85 @@
+#----------------------------------------------------------------------------#
+# Shared read queries.
+#
+# Used by the HTML views in views.py and the JSON API in api.py.
+#----------------------------------------------------------------------------#
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g
+
+from instrumentation import collectors, charged_to
+from models import db, Venue, Artist, Show
+
+executor = None
+executor_lock = threading.Lock()
+
+
+def get_dict_from_model(instance):
+    return {column.name: getattr(instance, column.name) for column in instance.__table__.columns}
+
+def venue_shows(venue_id):
+    return db.session.query(Show.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link'), Show.start_time, (Show.start_time > db.func.now()).label('upcoming')) \
+        .join(Artist) \
+        .filter(Show.venue_id==venue_id) \
+        .order_by(Show.start_time, Show.id)
+
+def artist_shows(artist_id):
+    return db.session.query(Show.venue_id, Venue.name.label('venue_name'), Venue.image_link.label('venue_image_link'), Show.start_time, (Show.start_time > db.func.now()).label('upcoming')) \
+        .join(Venue) \
+        .filter(Show.artist_id==artist_id) \
+        .order_by(Show.start_time, Show.id)
+
+def get_show_partitions(shows):
+    # shows must be ordered by start_time and carry the database side `upcoming` flag
+    upcoming_shows = []
+    past_shows = []
+    for row in shows:
+        show = row._asdict()
+        if show.pop('upcoming'):
+            upcoming_shows.append(show)
+        else:
+            past_shows.append(show)
+    return {
+        'upcoming_shows': upcoming_shows,
+        'past_shows': past_shows,
+        'upcoming_shows_count': len(upcoming_shows),
+        'past_shows_count': len(past_shows)
+    }
+
+def get_executor(app):
+    global executor
+    if executor is None:
+        with executor_lock:
+            if executor is None:
+                executor = ThreadPoolExecutor(app.config.get('READ_QUERY_THREADS', 16), thread_name_prefix='read-query')
+    return executor
+
+def concurrently(*calls):
+    """Run independent read queries at the same time; returns their results.
+
+    Each call runs in its own app context, so on its own session and
+    pooled connection, and must load its rows before returning. The
+    request's replica choice and query accounting carry over. On SQLite,
+    where the calls would share one database file, and with
+    CONCURRENT_READ_QUERIES off, they simply run one after another.
+    """
+    app = current_app._get_current_object()
+    if not app.config.get('CONCURRENT_READ_QUERIES') or db.engine.dialect.name == 'sqlite':
+        return [call() for call in calls]
+    request_g = g._get_current_object()
+    stats = collectors()
+
+    def run(call):
+        with app.app_context(), charged_to(stats):
+            g.read_replica = request_g.get('read_replica')
+            try:
+                return call()
+            finally:
+                # lets read_replica retry on the primary if this replica failed
+                if g.get('replica') is not None:
+                    request_g.replica = g.replica
+
+    futures = [get_executor(app).submit(run, call) for call in calls]
+    return [future.result() for future in futures]
@@ -0,0 +1,156 @@
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#
+# Views wrapped in read_replica run their queries against one of the
+# SQLALCHEMY_REPLICA_URIS, round robin; everything else, and any flush,
+# goes to the primary SQLALCHEMY_DATABASE_URI. A replica whose connection
+# fails is skipped for REPLICA_RETRY_SECONDS and the view is run again on
+# the primary. Streamed responses are covered as far as their first batch,
+# which api.stream_rows fetches before returning; a replica failing later
+# cuts the stream short. After a client writes, its next
+# REPLICA_STICKY_SECONDS of requests read from the primary so it sees its
+# own changes despite lag.
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+from functools import wraps
+from itertools import count
+
+from flask import current_app, g, session, has_app_context, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, exc, orm
+from sqlalchemy.engine.url import make_url
+
+# pool arguments the SQLite pools (NullPool/StaticPool) do not take
+QUEUE_POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+class Replica(object):
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.down_until = 0
+        self.failures = 0
+
+    @property
+    def available(self):
+        return self.down_until <= time.time()
+
+
+class ReplicaSet(object):
+
+    def __init__(self, replicas, retry_after=30):
+        self.replicas = replicas
+        self.retry_after = retry_after
+        self.counter = count()
+        for replica in replicas:
+            event.listen(replica.engine, 'handle_error', self.connection_error(replica))
+
+    def connection_error(self, replica):
+        # handle_error also fires when the initial connect fails
+        def listener(context):
+            dbapi = replica.engine.dialect.dbapi
+            if context.is_disconnect or isinstance(context.original_exception, dbapi.OperationalError):
+                self.mark_down(replica)
+        return listener
+
+    def mark_down(self, replica):
+        replica.down_until = time.time() + self.retry_after
+        replica.failures += 1
+        replica.engine.dispose()
+
+    def choose(self):
+        available = [replica for replica in self.replicas if replica.available]
+        if not available:
+            return None
+        return available[next(self.counter) % len(available)]
+
+    def stats(self):
+        return [
+            {'uri': repr(replica.engine.url), 'available': replica.available, 'failures': replica.failures}
+            for replica in self.replicas
+        ]
+
+
+class RoutingSession(SignallingSession):
+
+    def __init__(self, db, **options):
+        self.db = db
+        SignallingSession.__init__(self, db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and has_app_context() and g.get('read_replica'):
+            replica = self.db.get_replicas(self.app).choose()
+            if replica is not None:
+                g.replica = replica
+                return replica.engine
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def __init__(self, *args, **kwargs):
+        self._replica_lock = threading.Lock()
+        SQLAlchemy.__init__(self, *args, **kwargs)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_RETRY_SECONDS', 30)
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+        SQLAlchemy.init_app(self, app)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        if sa_url.drivername == 'sqlite':
+            engine_opts = {key: value for key, value in engine_opts.items() if key not in QUEUE_POOL_OPTIONS}
+        return SQLAlchemy.create_engine(self, sa_url, engine_opts)
+
+    def get_replicas(self, app):
+        # created on first use, like the primary engine, so the config
+        # may still change after init_app
+        replicas = app.extensions.get('replicas')
+        if replicas is None:
+            with self._replica_lock:
+                replicas = app.extensions.get('replicas')
+                if replicas is None:
+                    replicas = ReplicaSet(
+                        [Replica(self.create_replica_engine(app, uri)) for uri in app.config['SQLALCHEMY_REPLICA_URIS']],
+                        app.config['REPLICA_RETRY_SECONDS']
+                    )
+                    app.extensions['replicas'] = replicas
+        return replicas
+
+    def create_replica_engine(self, app, uri):
+        # same options as the primary engine gets in flask_sqlalchemy
+        sa_url = make_url(uri)
+        options = {}
+        self.apply_pool_defaults(app, options)
+        self.apply_driver_hacks(app, sa_url, options)
+        options.update(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        return self.create_engine(sa_url, options)
+
+
+def read_replica(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if session.get('read_primary_until', 0) > time.time():
+            return view(*args, **kwargs)
+        g.read_replica = True
+        try:
+            return view(*args, **kwargs)
+        except exc.OperationalError:
+            if g.pop('replica', None) is None:
+                raise
+            current_app.extensions['sqlalchemy'].db.session.rollback()
+            g.read_replica = False
+            return view(*args, **kwargs)
+    # lets the ASGI adapter give read-only views their own concurrency limit
+    wrapper.read_only = True
+    return wrapper
+
+def stick_to_primary(models):
+    if has_request_context():
+        session['read_primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
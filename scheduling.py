@@ -0,0 +1,242 @@
+#----------------------------------------------------------------------------#
+# Show scheduling and double-booking detection.
+#
+# A booking conflicts with another show at the same venue, or by the same
+# artist, that starts less than the conflict window before or after it.
+# Existing shows are checked for a whole batch with one statement: the
+# bookings are bound as arrays (a JSON array on SQLite) and unnested into
+# a CTE joined to Show on the (venue_id, start_time) and
+# (artist_id, start_time) range indexes. The venue and artist rows are
+# locked first, so concurrent batches for them check and insert in turn.
+#
+# The venue and artist calendars read the same indexes: a month grid and
+# a period's free slots each take one range scan of the shows starting
+# in their range, however many shows the venue or artist has had.
+#----------------------------------------------------------------------------#
+
+import calendar
+import json
+from collections import defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+
+from flask import current_app
+from sqlalchemy.dialects import postgresql
+
+from models import db, Venue, Artist, Show
+
+Booking = namedtuple('Booking', ['line', 'artist_id', 'venue_id', 'start_time'])
+Conflict = namedtuple('Conflict', ['booking', 'reason', 'other_start_time'])
+
+
+def parse_bookings(text):
+    """Parse "artist_id, venue_id, start_time" lines.
+
+    Returns (bookings, errors); errors name the offending line.
+    """
+    bookings = []
+    errors = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        parts = [part.strip() for part in line.split(',')]
+        try:
+            if len(parts) != 3:
+                raise ValueError('expected artist_id, venue_id, start_time')
+            bookings.append(Booking(number, int(parts[0]), int(parts[1]), datetime.fromisoformat(parts[2])))
+        except ValueError as e:
+            errors.append('Line %d: %s' % (number, e))
+    return bookings, errors
+
+def missing_references(bookings):
+    artist_ids = {booking.artist_id for booking in bookings}
+    venue_ids = {booking.venue_id for booking in bookings}
+    found_artists = {id for id, in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+    found_venues = {id for id, in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+    errors = []
+    for booking in bookings:
+        if booking.artist_id not in found_artists:
+            errors.append('Line %d: no artist with id %d' % (booking.line, booking.artist_id))
+        if booking.venue_id not in found_venues:
+            errors.append('Line %d: no venue with id %d' % (booking.line, booking.venue_id))
+    return errors
+
+def booking_rows(bookings, window):
+    """The bookings as rows of (number, artist_id, venue_id, window_start,
+    window_end), from a fixed number of bind parameters however long the
+    batch: arrays unnested on PostgreSQL, a JSON array on SQLite."""
+    columns = dict(number=db.Integer, artist_id=db.Integer, venue_id=db.Integer,
+                   window_start=db.DateTime, window_end=db.DateTime)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        arrays = {
+            'numbers': (db.Integer, list(range(len(bookings)))),
+            'artist_ids': (db.Integer, [booking.artist_id for booking in bookings]),
+            'venue_ids': (db.Integer, [booking.venue_id for booking in bookings]),
+            'window_starts': (db.DateTime, [booking.start_time - window for booking in bookings]),
+            'window_ends': (db.DateTime, [booking.start_time + window for booking in bookings]),
+        }
+        rows = db.text(
+            'SELECT * FROM unnest(:numbers, :artist_ids, :venue_ids, :window_starts, :window_ends) '
+            'AS bookings (number, artist_id, venue_id, window_start, window_end)'
+        ).bindparams(*[db.bindparam(name, values, type_=postgresql.ARRAY(type_)) for name, (type_, values) in arrays.items()])
+    else:
+        # SQLite stores datetimes as text in this format and compares them
+        # as strings
+        stored = '%Y-%m-%d %H:%M:%S.%f'
+        rows = db.text(
+            "SELECT json_extract(value, '$[0]') AS number, json_extract(value, '$[1]') AS artist_id, "
+            "json_extract(value, '$[2]') AS venue_id, json_extract(value, '$[3]') AS window_start, "
+            "json_extract(value, '$[4]') AS window_end FROM json_each(:bookings)"
+        ).bindparams(bookings=json.dumps([
+            [number, booking.artist_id, booking.venue_id,
+             (booking.start_time - window).strftime(stored), (booking.start_time + window).strftime(stored)]
+            for number, booking in enumerate(bookings)
+        ]))
+    return rows.columns(**columns).cte('bookings')
+
+def lock_parents(bookings):
+    """Lock the bookings' venue and artist rows until the transaction ends.
+
+    Bookings are checked and inserted under these locks, so two batches
+    for the same venue or artist cannot both pass the check before either
+    commits. FOR NO KEY UPDATE still lets other shows reference the rows.
+    SQLite has no row locks; there the check is not serialized.
+    """
+    for model, key in ((Venue, 'venue_id'), (Artist, 'artist_id')):
+        ids = sorted({getattr(booking, key) for booking in bookings})
+        db.session.query(model.id).filter(model.id.in_(ids)).order_by(model.id).with_for_update(key_share=True).all()
+
+def existing_conflicts(bookings, window):
+    rows = booking_rows(bookings, window)
+
+    def overlapping(key, reason):
+        return db.select([rows.c.number, db.literal(reason).label('reason'), Show.start_time]) \
+            .select_from(rows.join(Show, db.and_(
+                getattr(Show, key)==getattr(rows.c, key),
+                Show.start_time > rows.c.window_start,
+                Show.start_time < rows.c.window_end
+            )))
+
+    query = db.union_all(overlapping('venue_id', 'venue'), overlapping('artist_id', 'artist'))
+    return [
+        Conflict(bookings[number], reason, start_time)
+        for number, reason, start_time in db.session.execute(query)
+    ]
+
+def batch_conflicts(bookings, window):
+    # bookings inside the same batch, found by a sweep over each sort order
+    conflicts = []
+    for key, reason in (('venue_id', 'venue'), ('artist_id', 'artist')):
+        ordered = sorted(bookings, key=lambda booking: (getattr(booking, key), booking.start_time))
+        for previous, booking in zip(ordered, ordered[1:]):
+            if getattr(previous, key)==getattr(booking, key) and booking.start_time - previous.start_time < window:
+                conflicts.append(Conflict(booking, reason, previous.start_time))
+    return conflicts
+
+def find_conflicts(bookings, window):
+    if not bookings:
+        return []
+    lock_parents(bookings)
+    conflicts = existing_conflicts(bookings, window) + batch_conflicts(bookings, window)
+    return sorted(conflicts, key=lambda conflict: (conflict.booking.line, conflict.reason))
+
+def describe(conflict):
+    what = 'venue %d' % conflict.booking.venue_id if conflict.reason == 'venue' else 'artist %d' % conflict.booking.artist_id
+    return '%s is already booked at %s' % (what, conflict.other_start_time.strftime('%Y-%m-%d %H:%M'))
+
+def schedule(bookings):
+    db.session.add_all([
+        Show(artist_id=booking.artist_id, venue_id=booking.venue_id, start_time=booking.start_time)
+        for booking in bookings
+    ])
+    db.session.commit()
+
+def conflict_window():
+    return timedelta(hours=current_app.config.get('SHOW_CONFLICT_WINDOW_HOURS', 4))
+
+
+#  Calendar
+#  ----------------------------------------------------------------
+
+# the longest period whose free slots can be asked for at once
+CALENDAR_MAX_DAYS = 92
+
+Day = namedtuple('Day', ['date', 'in_month', 'shows'])
+Calendar = namedtuple('Calendar', ['month', 'weeks', 'start', 'end', 'shows', 'free'])
+
+
+def parse_month(value, today):
+    """The first day of a "YYYY-MM" month, or of today's month."""
+    if not value:
+        return today.replace(day=1)
+    return datetime.strptime(value, '%Y-%m').date()
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+def parse_period(start, end, today):
+    """The [start, end) datetimes of ISO dates or datetimes; this week,
+    Monday to Monday, when start is empty, and a week from start when
+    end is."""
+    start = datetime.fromisoformat(start) if start else datetime.combine(today - timedelta(days=today.weekday()), time())
+    end = datetime.fromisoformat(end) if end else start + timedelta(days=7)
+    if end <= start:
+        raise ValueError('end must be after start')
+    if end - start > timedelta(days=CALENDAR_MAX_DAYS):
+        raise ValueError('periods are at most %d days long' % CALENDAR_MAX_DAYS)
+    return start, end
+
+def shows_between(shows, start, end):
+    # shows is venue_shows() or artist_shows(), filtered on the entity;
+    # with start_time bounded too, it is a range scan of its index
+    return shows.filter(Show.start_time >= start, Show.start_time < end).all()
+
+def month_weeks(month, shows):
+    """The weeks of month's calendar, Monday first, as Days with the shows
+    starting on them; shows must cover the whole grid."""
+    by_date = defaultdict(list)
+    for show in shows:
+        by_date[show.start_time.date()].append(show)
+    return [
+        [Day(date, date.month == month.month, by_date[date]) for date in week]
+        for week in calendar.Calendar().monthdatescalendar(month.year, month.month)
+    ]
+
+def free_slots(start_times, start, end, window):
+    """The (earliest, latest) ranges of start times in [start, end) that
+    no show starting at start_times (ordered) conflicts with."""
+    free = []
+    earliest = start
+    for start_time in start_times:
+        latest = min(start_time - window, end)
+        if latest >= earliest and earliest < end:
+            free.append((earliest, latest))
+        earliest = max(earliest, start_time + window)
+    if earliest < end:
+        free.append((earliest, end))
+    return free
+
+def build_calendar(shows, month=None, start=None, end=None, today=None):
+    """A venue's or artist's Calendar: month's grid, and the shows and
+    free slots of the period from start to end (see parse_period).
+
+    Raises ValueError for a malformed month or period.
+    """
+    today = today or datetime.utcnow().date()
+    month = parse_month(month, today)
+    start, end = parse_period(start, end, today)
+    weeks = calendar.Calendar().monthdatescalendar(month.year, month.month)
+    grid_shows = shows_between(shows, datetime.combine(weeks[0][0], time()),
+                               datetime.combine(weeks[-1][-1] + timedelta(days=1), time()))
+    # a show just outside the period still rules out the slots near it
+    window = conflict_window()
+    nearby = shows_between(shows, start - window, end + window)
+    return Calendar(
+        month=month,
+        weeks=month_weeks(month, grid_shows),
+        start=start,
+        end=end,
+        shows=[show for show in nearby if start <= show.start_time < end],
+        free=free_slots([show.start_time for show in nearby], start, end, window),
+    )
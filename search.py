@@ -0,0 +1,191 @@
+#----------------------------------------------------------------------------#
+# Venue and artist search.
+#
+# On PostgreSQL the ILIKE filters below are served by the pg_trgm GIN
+# indexes declared on the models, genre names go through the genres GIN
+# index, and results are ranked in the database.
+# Everywhere else (SQLite, test runs) an in-memory trigram inverted index
+# is built from one bulk query and used instead of a table scan; it is
+# dropped whenever a Venue or Artist write commits.
+#----------------------------------------------------------------------------#
+
+from array import array
+from collections import namedtuple
+
+from flask import current_app
+
+from forms import genres_choices
+from models import db, Venue, Artist, has_genre, on_models_committed
+
+PER_PAGE = 20
+
+GENRES = {genre.lower(): genre for genre, _ in genres_choices}
+
+SearchResult = namedtuple('SearchResult', ['count', 'data', 'page', 'per_page'])
+
+
+def venues(term, page=1, per_page=PER_PAGE):
+    return search(Venue, term, page, per_page)
+
+def artists(term, page=1, per_page=PER_PAGE):
+    return search(Artist, term, page, per_page)
+
+def search(model, term, page=1, per_page=PER_PAGE):
+    term = (term or '').strip()
+    page = max(page, 1)
+    backend = current_app.config.get('SEARCH_BACKEND', 'auto')
+    if backend == 'auto':
+        backend = 'trigram' if db.engine.dialect.name == 'postgresql' else 'ngram'
+    if backend == 'trigram':
+        return trigram_search(model, term, page, per_page)
+    return ngram_search(model, term, page, per_page)
+
+
+def split_area(term):
+    # "San Francisco, CA" searches by city and state instead of free text
+    city, _, state = term.rpartition(',')
+    return city.strip(), state.strip()
+
+
+#  PostgreSQL / pg_trgm
+#  ----------------------------------------------------------------
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def trigram_search(model, term, page, per_page):
+    pattern = '%' + escape_like(term) + '%'
+    name_match = model.name.ilike(pattern, escape='\\')
+    if ',' in term:
+        city, state = split_area(term)
+        criteria = db.and_(model.city.ilike('%' + escape_like(city) + '%', escape='\\'), db.func.upper(model.state)==state.upper())
+    else:
+        criteria = [
+            name_match,
+            model.city.ilike(pattern, escape='\\'),
+            model.state.ilike(escape_like(term), escape='\\')
+        ]
+        if term.lower() in GENRES:
+            criteria.append(has_genre(model, GENRES[term.lower()]))
+        criteria = db.or_(*criteria)
+    rank = db.case([(name_match, 1.0)], else_=0.0) + db.func.word_similarity(term, model.name)
+    rows = db.session.query(model.id, model.name, model.city, model.state, db.func.count().over().label('total')) \
+        .filter(criteria) \
+        .order_by(rank.desc(), model.name, model.id) \
+        .limit(per_page) \
+        .offset((page - 1) * per_page) \
+        .all()
+    count = rows[0].total if rows else 0
+    data = [{'id': row.id, 'name': row.name, 'city': row.city, 'state': row.state} for row in rows]
+    return SearchResult(count, data, page, per_page)
+
+
+#  In-memory n-gram fallback
+#  ----------------------------------------------------------------
+
+class NgramIndex(object):
+    """Inverted index from character n-grams to document numbers.
+
+    Each document holds a display row and its searchable fields: the
+    lower-cased name, city and state, and the set of its genres.
+    Candidates come from the posting list of the rarest n-gram in the term
+    and are then verified and ranked, matching what trigram_search does on
+    PostgreSQL: a case-insensitive substring of the name or city, the
+    whole state, or the name of one of the genres.
+    """
+
+    def __init__(self, n=3):
+        self.n = n
+        self.rows = []
+        self.fields = []
+        self.postings = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def ngrams(self, text):
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    def add(self, row, name, city, state, genres):
+        doc = len(self.rows)
+        fields = (name.lower(), (city or '').lower(), (state or '').lower(), frozenset(genres or ()))
+        self.rows.append(row)
+        self.fields.append(fields)
+        grams = set()
+        for text in fields[:3] + tuple(genre.lower() for genre in fields[3]):
+            grams.update(self.ngrams(text))
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array('l')
+            posting.append(doc)
+
+    def candidates(self, term):
+        grams = self.ngrams(term)
+        if not grams:
+            return range(len(self.rows))
+        postings = [self.postings.get(gram) for gram in grams]
+        if None in postings:
+            return ()
+        return min(postings, key=len)
+
+    def rank(self, fields, term):
+        name, city, state, genres = fields
+        score = 0
+        position = name.find(term)
+        if position == 0 or (position > 0 and name[position - 1] == ' '):
+            score += 4
+        elif position > 0:
+            score += 3
+        if term in city:
+            score += 2
+        if term == state:
+            score += 2
+        if GENRES.get(term) in genres:
+            score += 1
+        return score
+
+    def search(self, term):
+        term = term.lower()
+        if ',' in term:
+            city, state = split_area(term)
+            matches = [
+                (0, self.fields[doc][0], doc) for doc in self.candidates(city)
+                if city in self.fields[doc][1] and self.fields[doc][2] == state
+            ]
+        else:
+            matches = []
+            for doc in self.candidates(term):
+                score = self.rank(self.fields[doc], term)
+                if score:
+                    matches.append((-score, self.fields[doc][0], doc))
+        matches.sort()
+        return [self.rows[doc] for _, _, doc in matches]
+
+
+_indexes = {}
+
+def build_index(model):
+    index = NgramIndex()
+    rows = db.session.query(model.id, model.name, model.city, model.state, model.genres) \
+        .order_by(model.id) \
+        .yield_per(10000)
+    for row in rows:
+        index.add({'id': row.id, 'name': row.name, 'city': row.city, 'state': row.state}, row.name, row.city, row.state, row.genres)
+    return index
+
+def ngram_search(model, term, page, per_page):
+    index = _indexes.get(model)
+    if index is None:
+        index = _indexes[model] = build_index(model)
+    if term:
+        matches = index.search(term)
+    else:
+        matches = sorted(index.rows, key=lambda row: (row['name'].lower(), row['id']))
+    start = (page - 1) * per_page
+    return SearchResult(len(matches), matches[start:start + per_page], page, per_page)
+
+@on_models_committed
+def drop_stale(models):
+    for model in models:
+        _indexes.pop(model, None)
@@ -2,3 +2,65 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// search box suggestions from /api/v1/autocomplete, fetched as the user types
+document.addEventListener('DOMContentLoaded', function () {
+  Array.prototype.forEach.call(document.querySelectorAll('input[data-suggest]'), function (input) {
+    var list = document.getElementById(input.getAttribute('list'));
+    var timer = null;
+    input.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        var term = input.value.trim();
+        if (!term) {
+          list.innerHTML = '';
+          return;
+        }
+        fetch(input.getAttribute('data-suggest') + '&q=' + encodeURIComponent(term))
+          .then(function (response) { return response.json(); })
+          .then(function (data) {
+            list.innerHTML = '';
+            data.suggestions.forEach(function (suggestion) {
+              var option = document.createElement('option');
+              option.value = suggestion.name;
+              list.appendChild(option);
+            });
+          });
+      }, 100);
+    });
+  });
+});
+
+// suggested matches on the detail pages, from /api/v1/<venues|artists>/<id>/matches
+document.addEventListener('DOMContentLoaded', function () {
+  Array.prototype.forEach.call(document.querySelectorAll('[data-matches]'), function (row) {
+    fetch(row.getAttribute('data-matches'))
+      .then(function (response) { return response.json(); })
+      .then(function (data) {
+        data.matches.forEach(function (match) {
+          var column = document.createElement('div');
+          column.className = 'col-sm-4';
+          var tile = document.createElement('div');
+          tile.className = 'tile tile-show';
+          var image = document.createElement('img');
+          image.src = match.image_link;
+          image.alt = match.name;
+          var name = document.createElement('h5');
+          var link = document.createElement('a');
+          link.href = match.url;
+          link.textContent = match.name;
+          name.appendChild(link);
+          var details = document.createElement('h6');
+          details.textContent = match.city + ', ' + match.state + ' · ' + match.shared_genres.join(', ');
+          tile.appendChild(image);
+          tile.appendChild(name);
+          tile.appendChild(details);
+          column.appendChild(tile);
+          row.appendChild(column);
+        });
+        if (data.matches.length) {
+          row.parentNode.hidden = false;
+        }
+      });
+  });
+});
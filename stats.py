@@ -0,0 +1,77 @@
+#----------------------------------------------------------------------------#
+# Show statistics commands.
+#
+#   flask stats roll       run every minute or so, e.g. from cron
+#   flask stats rebuild    after loading data behind the app's back
+#
+# The VenueStats and ArtistStats rows (see models.py) are kept current by
+# the Show mapper events, except for shows starting: until the next roll
+# a show that has started is still counted as upcoming.
+#----------------------------------------------------------------------------#
+
+import time
+
+import click
+from flask.cli import AppGroup
+
+from models import db, Show, SHOW_STATS, next_show_select, insert_show_stats, record_changes
+
+stats_cli = AppGroup('stats', help='Maintain the venue and artist show counts.')
+
+
+def roll_past():
+    """Move the shows that have started since the last roll into past.
+
+    Only rows whose next upcoming show has started can change, so the
+    next_show_at index limits the update to those. Returns the number of
+    rows updated.
+    """
+    updated = 0
+    now = db.func.now()
+    for stats, (_, key) in SHOW_STATS.items():
+        table = stats.__table__
+        started = db.select([db.func.count(Show.id)]).where(db.and_(
+            Show.__table__.c[key]==table.c[key],
+            Show.start_time > table.c.counted_at,
+            Show.start_time <= now,
+        )).as_scalar()
+        updated += db.session.execute(table.update().where(table.c.next_show_at <= now).values(
+            upcoming_shows_count=table.c.upcoming_shows_count - started,
+            past_shows_count=table.c.past_shows_count + started,
+            next_show_at=next_show_select(stats, now),
+            counted_at=now,
+        )).rowcount
+    record_changes(db.session, set(SHOW_STATS))
+    return updated
+
+def rebuild_stats(ids=None):
+    """Recompute the stats rows from the Show table.
+
+    ids maps a stats model to the ids to rebuild; models left out, or
+    ids=None, are rebuilt in full.
+    """
+    for stats, (model, key) in SHOW_STATS.items():
+        model_ids = None if ids is None else ids.get(stats)
+        delete = stats.__table__.delete()
+        if model_ids is not None:
+            delete = delete.where(stats.__table__.c[key].in_(model_ids))
+        db.session.execute(delete)
+        insert_show_stats(db.session.connection(), stats, model_ids)
+    record_changes(db.session, set(SHOW_STATS))
+
+
+@stats_cli.command('roll')
+def roll_command():
+    """Count shows that have started as past shows."""
+    started = time.time()
+    updated = roll_past()
+    db.session.commit()
+    click.echo('stats: %d rows rolled in %.2fs' % (updated, time.time() - started), err=True)
+
+@stats_cli.command('rebuild')
+def rebuild_command():
+    """Recompute every venue's and artist's show counts."""
+    started = time.time()
+    rebuild_stats()
+    db.session.commit()
+    click.echo('stats: rebuilt in %.1fs' % (time.time() - started), err=True)
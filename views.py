@@ -0,0 +1,416 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+
+from itertools import groupby
+from flask import (
+Blueprint,
+render_template,
+request,
+flash,
+redirect,
+url_for,
+abort,
+jsonify
+)
+from forms import ShowForm, ShowBatchForm, ArtistForm, VenueForm
+from models import db, Venue, Artist, Show, VenueStats, has_genre
+import search
+from queries import get_dict_from_model, get_show_partitions, venue_shows, artist_shows, concurrently
+from pagination import keyset_paginate
+from cache import PageCache
+from conditional import conditional, entity_version, listing_version
+from routing import read_replica
+from loading import loader_options
+from scheduling import Booking, parse_bookings, missing_references, find_conflicts, describe, schedule, conflict_window, build_calendar, add_months
+
+#----------------------------------------------------------------------------#
+# Blueprint.
+#----------------------------------------------------------------------------#
+
+# registered, and page_cache bound, in create_app() (app.py)
+main = Blueprint('main', __name__)
+page_cache = PageCache()
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@main.route('/')
+def index():
+    return render_template('pages/home.html')
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+def group_by_area(rows):
+    # rows must arrive ordered by city, state so each area is one contiguous run
+    for (city, state), area_rows in groupby(rows, key=lambda row: (row.city, row.state)):
+        yield {
+            'city': city,
+            'state': state,
+            'venues': [
+                {'id': row.id, 'name': row.name, 'num_upcoming_shows': row.num_upcoming_shows}
+                for row in area_rows
+            ]
+        }
+
+@main.route('/venues')
+@read_replica
+@conditional(listing_version(Venue, VenueStats))
+@page_cache.cached
+def venues():
+    # one ordered query; upcoming shows are counted ahead in VenueStats,
+    # where a venue without shows may have no row yet
+    num_upcoming_shows = db.func.coalesce(VenueStats.upcoming_shows_count, 0).label('num_upcoming_shows')
+    data1 = db.session.query(Venue.id, Venue.name, Venue.city, Venue.state, num_upcoming_shows) \
+        .outerjoin(VenueStats, VenueStats.venue_id==Venue.id)
+    genre = request.args.get('genre')
+    if genre:
+        data1 = data1.filter(has_genre(Venue, genre))
+    # pages follow the area grouping, so the key leads with city and state
+    page = keyset_paginate(data1, [Venue.city, Venue.state, Venue.name, Venue.id], request.args.get('after'), request.args.get('before'))
+    return render_template('pages/venues.html', areas=group_by_area(page.items), page=page)
+
+@main.route('/venues/search', methods=['GET', 'POST'])
+@read_replica
+def search_venues():
+    # seach for Hop should return "The Musical Hop".
+    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+    # search for "San Francisco, CA" should return the venues in that city
+    search_term = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    response = search.venues(search_term, page)
+    return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+@main.route('/venues/<int:venue_id>')
+@read_replica
+@conditional(entity_version(Venue, Show.venue_id, Artist, Show.artist_id))
+@page_cache.cached
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    # the venue row and its shows are fetched at the same time
+    data1, shows = concurrently(
+        lambda: db.session.query(Venue).options(*loader_options('venue_detail')).filter(Venue.id==venue_id).first(),
+        lambda: venue_shows(venue_id).all()
+    )
+    if data1 is None:
+        abort(404)
+    data = get_dict_from_model(data1)
+    data.update(get_show_partitions(shows))
+    return render_template('pages/show_venue.html', venue=data)
+
+def calendar_page(entity, shows, kind):
+    # ?month=2026-10 picks the grid, ?start=&end= the period of the agenda
+    # and its free slots (this week by default)
+    if entity is None:
+        abort(404)
+    try:
+        calendar = build_calendar(shows, request.args.get('month'), request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        abort(400)
+    return render_template('pages/calendar.html', entity=entity, kind=kind, calendar=calendar,
+                           previous_month=add_months(calendar.month, -1), next_month=add_months(calendar.month, 1))
+
+@main.route('/venues/<int:venue_id>/calendar')
+@read_replica
+def venue_calendar(venue_id):
+    venue = db.session.query(Venue.id, Venue.name).filter(Venue.id==venue_id).first()
+    return calendar_page(venue, venue_shows(venue_id), 'venue')
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@main.route('/venues/create', methods=['GET'])
+def create_venue_form():
+    form = VenueForm()
+    return render_template('forms/new_venue.html', form=form)
+
+@main.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    error = False
+    form = VenueForm(request.form)
+    try:
+        venue = Venue()
+        form.populate_obj(venue)
+        db.session.add(venue)
+        db.session.commit()
+        flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    except ValueError as e:
+        error = True
+        print(e)
+        flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+        db.session.rollback()
+    finally:
+        db.session.close()
+    if error:
+        abort (400)
+    else:
+        return render_template('pages/home.html')
+
+
+@main.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    error = False
+    try:
+        # through the session, so the delete reaches the mapper events that
+        # version pages and update the search indexes; a bulk query delete
+        # would skip them
+        venue = db.session.query(Venue).filter(Venue.id==venue_id).first()
+        if venue is not None:
+            db.session.delete(venue)
+        db.session.commit()
+    except:
+        error = True
+        db.session.rollback()
+    finally:
+        db.session.close()
+    # a venue with shows is kept by their foreign key
+    if error:
+        abort(400)
+    return '', 204
+
+#  Artists
+#  ----------------------------------------------------------------
+@main.route('/artists')
+@read_replica
+@conditional(listing_version(Artist))
+@page_cache.cached
+def artists():
+    data1 = db.session.query(Artist.id, Artist.name)
+    genre = request.args.get('genre')
+    if genre:
+        data1 = data1.filter(has_genre(Artist, genre))
+    page = keyset_paginate(data1, [Artist.name, Artist.id], request.args.get('after'), request.args.get('before'))
+    return render_template('pages/artists.html', artists=page.items, page=page)
+
+@main.route('/artists/search', methods=['GET', 'POST'])
+@read_replica
+def search_artists():
+    # implement search on artists with partial string search. Ensure it is case-insensitive.
+    # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+    # search for "band" should return "The Wild Sax Band".
+    search_term = request.values.get('search_term', '')
+    page = request.args.get('page', 1, type=int)
+    response = search.artists(search_term, page)
+    return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+@main.route('/artists/<int:artist_id>')
+@read_replica
+@conditional(entity_version(Artist, Show.artist_id, Venue, Show.venue_id))
+@page_cache.cached
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    data1, shows = concurrently(
+        lambda: db.session.query(Artist).options(*loader_options('artist_detail')).filter(Artist.id==artist_id).first(),
+        lambda: artist_shows(artist_id).all()
+    )
+    if data1 is None:
+        abort(404)
+    data = get_dict_from_model(data1)
+    data.update(get_show_partitions(shows))
+    return render_template('pages/show_artist.html', artist=data)
+
+@main.route('/artists/<int:artist_id>/calendar')
+@read_replica
+def artist_calendar(artist_id):
+    artist = db.session.query(Artist.id, Artist.name).filter(Artist.id==artist_id).first()
+    return calendar_page(artist, artist_shows(artist_id), 'artist')
+
+#  Update
+#  ----------------------------------------------------------------
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    form = ArtistForm()
+    artist = db.session.query(Artist).get(artist_id)
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+    form = ArtistForm(request.form)
+    try:
+        data = request.form
+        artist = db.session.query(Artist).get(artist_id)
+        form.populate_obj(artist)
+        db.session.commit()
+    except:
+        db.session.rollback()
+    finally:
+        db.session.close()
+    return redirect(url_for('main.show_artist', artist_id=artist_id))
+
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    form = VenueForm()
+    venue = db.session.query(Venue).get(venue_id)
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    # take values from the form submitted, and update existing
+    # venue record with ID <venue_id> using the new attributes
+    form = VenueForm(request.form)
+    try:
+        data = request.form
+        venue = db.session.query(Venue).get(venue_id)
+        form.populate_obj(venue)
+        db.session.commit()
+    except:
+        db.session.rollback()
+    finally:
+        db.session.close()    
+    return redirect(url_for('main.show_venue', venue_id=venue_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@main.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+@main.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    error = False
+    form = ArtistForm(request.form)
+    try:
+        artist = Artist()
+        form.populate_obj(artist)
+        db.session.add(artist)
+        db.session.commit()
+        flash('Artist ' + request.form['name'] + ' was successfully listed!')
+    except ValueError as e:
+        error = True
+        print(e)
+        flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+        db.session.rollback()
+    finally:
+        db.session.close()
+    if error:
+        abort (400)
+    else:
+        return render_template('pages/home.html')
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@main.route('/shows')
+@read_replica
+@conditional(listing_version(Show, Artist, Venue))
+@page_cache.cached
+def shows():
+    # displays list of shows at /shows
+    # replace with real venues data.
+    # num_shows should be aggregated based on number of upcoming shows per venue.
+    #artist_name = aliased(name)
+    data = db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Artist.image_link.label("artist_image_link"), Artist.name.label("artist_name"), Venue.name.label("venue_name")).join(Artist).join(Venue)
+    page = keyset_paginate(data, [Show.start_time, Show.id], request.args.get('after'), request.args.get('before'))
+    return render_template('pages/shows.html', shows=page.items, page=page)
+
+@main.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+@main.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    # insert form data as a new Show record in the db, instead
+    error = False
+    form = ShowForm(request.form)
+    try:
+        show = Show()
+        form.populate_obj(show)
+        conflicts = find_conflicts([Booking(1, int(show.artist_id), int(show.venue_id), show.start_time)], conflict_window())
+        if conflicts:
+            for conflict in conflicts:
+                flash('Show could not be listed: ' + describe(conflict))
+            return render_template('forms/new_show.html', form=form), 409
+        db.session.add(show)
+        db.session.commit()
+        # on successful db insert, flash success
+        flash('Show was successfully listed!')
+    except:
+        error = True
+        db.session.rollback()
+        # on unsuccessful db insert, flash an error.
+        flash('An error occurred. Show could not be listed.')
+    finally:
+        db.session.close()
+    if error:
+        abort (400)
+    else:
+        return render_template('pages/home.html')
+
+@main.route('/shows/create/batch', methods=['GET', 'POST'])
+def create_show_batch():
+    # books a whole tour at once: one "artist_id, venue_id, start_time" per line,
+    # inserted in one transaction only when no line double-books a venue or artist
+    form = ShowBatchForm(request.form)
+    if request.method == 'GET':
+        return render_template('forms/new_show_batch.html', form=form)
+    if not form.validate():
+        for name, messages in form.errors.items():
+            for message in messages:
+                flash('%s: %s' % (name, message))
+        return render_template('forms/new_show_batch.html', form=form), 400
+    bookings, errors = parse_bookings(form.shows.data)
+    if bookings and not errors:
+        errors = missing_references(bookings)
+    if bookings and not errors:
+        errors = ['Line %d: %s' % (conflict.booking.line, describe(conflict)) for conflict in find_conflicts(bookings, conflict_window())]
+    if errors or not bookings:
+        for message in errors or ['No shows to list.']:
+            flash(message)
+        return render_template('forms/new_show_batch.html', form=form), 409 if errors else 400
+    try:
+        schedule(bookings)
+        flash('%d shows were successfully listed!' % len(bookings))
+    except:
+        db.session.rollback()
+        flash('An error occurred. Shows could not be listed.')
+        abort(400)
+    finally:
+        db.session.close()
+    return render_template('pages/home.html')
+
+@main.route('/cache/stats')
+def cache_stats():
+    return jsonify(page_cache.stats())
+
+@main.app_errorhandler(404)
+def not_found_error(error):
+    return render_template('errors/404.html'), 404
+
+@main.app_errorhandler(500)
+def server_error(error):
+    return render_template('errors/500.html'), 500
+
+@main.app_errorhandler(401)
+def not_found_error(error):
+    return render_template('errors/401.html'), 401
+
+@main.app_errorhandler(403)
+def server_error(error):
+    return render_template('errors/403.html'), 403
+
+@main.app_errorhandler(422)
+def server_error(error):
+    return render_template('errors/422.html'), 422
+
+@main.app_errorhandler(405)
+def not_found_error(error):
+    return render_template('errors/405.html'), 405
+
+@main.app_errorhandler(409)
+def server_error(error):
+    return render_template('errors/409.html'), 409
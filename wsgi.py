@@ -0,0 +1,12 @@
+#----------------------------------------------------------------------------#
+# WSGI entry point.
+#
+#   gunicorn --preload --workers 4 wsgi:app
+#
+# create_app() opens no database connection, so the app can be built once
+# in the master and shared by the forked workers.
+#----------------------------------------------------------------------------#
+
+from app import create_app
+
+app = create_app()